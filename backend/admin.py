@@ -1,11 +1,23 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import json
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from models import db, User, AuditLog, Position, UserPosition
+from models import db, User, Position, UserPosition, AuditLog, UserNotificationCounter
 from werkzeug.security import generate_password_hash
 from sqlalchemy.exc import IntegrityError
 from marshmallow import Schema, fields, validate, ValidationError
 from datetime import datetime
+from collections import defaultdict
+from sqlalchemy import or_, tuple_
+from listing import is_paginated, parse_limit, parse_bool, parse_datetime, decode_cursor, paginate, with_next_cursor, prefix_range, InvalidListingParams
+from permissions import is_admin, invalidate_user_positions
+from reference import positions as position_registry
+from http_cache import conditional_json
+from serialization import json_response, fetch_rows
+from audit import record_audit, flush_audit
+from passwords import PasswordPoolBusy
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -30,32 +42,64 @@ class UserUpdateSchema(Schema):
 class PositionCreateSchema(Schema):
     title = fields.Str(required=True, validate=validate.Length(min=1, max=100))
 
-def is_admin(user_id):
-    """Проверяет, является ли пользователь администратором."""
-    admin_position = Position.query.filter_by(title='Администратор').first()
-    if not admin_position:
-        return False
-    return UserPosition.query.filter_by(
-        user_id=user_id,
-        position_id=admin_position.id
-    ).first() is not None
-
 @admin_bp.route('/users', methods=['GET'])
 @jwt_required()
 def get_users():
+    """Справочник пользователей для администратора.
+
+    Параметры: q — префикс имени пользователя или ФИО без учёта регистра,
+    position_id, is_active, limit и cursor (постранично по id; без них
+    список отдаётся целиком). Должности загружаются одним дополнительным
+    запросом.
+    """
     current_user_id = int(get_jwt_identity())
     if not is_admin(current_user_id):
         return jsonify({"error": "Требуются права администратора"}), 403
     
-    users = User.query.all()
-    return jsonify([{
-        'id': u.id,
-        'username': u.username,
-        'full_name': u.full_name,
-        'email': u.email,
-        'is_active': u.is_active,
-        'positions': [p.title for p in u.positions]
-    } for u in users])
+    try:
+        limit = parse_limit(default=100, maximum=500) if is_paginated() else None
+        cursor = decode_cursor(int)
+    except InvalidListingParams as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = db.session.query(User.id, User.username, User.full_name, User.email, User.is_active)
+
+    search = request.args.get('q', '').strip().lower()
+    if search:
+        query = query.filter(or_(
+            prefix_range(User.username_search, search),
+            prefix_range(User.full_name_search, search)
+        ))
+    is_active = parse_bool('is_active')
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    position_id = request.args.get('position_id', type=int)
+    if position_id is not None:
+        query = query.filter(
+            db.session.query(UserPosition.id).filter(
+                UserPosition.user_id == User.id,
+                UserPosition.position_id == position_id
+            ).exists()
+        )
+    if cursor:
+        query = query.filter(User.id > cursor[0])
+
+    query = query.order_by(User.id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    users = fetch_rows(query)
+    users, next_cursor = paginate(users, limit, lambda u: (u['id'],))
+
+    positions_by_user = defaultdict(list)
+    if users:
+        for user_id, title in db.session.query(UserPosition.user_id, Position.title).join(
+            Position, Position.id == UserPosition.position_id
+        ).filter(UserPosition.user_id.in_([u['id'] for u in users])).order_by(Position.title):
+            positions_by_user[user_id].append(title)
+    for u in users:
+        u['positions'] = positions_by_user[u['id']]
+
+    return with_next_cursor(json_response(users), next_cursor)
 
 @admin_bp.route('/users', methods=['POST'])
 @jwt_required()
@@ -81,6 +125,7 @@ def add_user():
             updated_at=datetime.utcnow()
         )
         user.set_password(data['password'])
+        user.notification_counter = UserNotificationCounter(unread_count=0)
         db.session.add(user)
         db.session.flush()
 
@@ -89,25 +134,21 @@ def add_user():
             pos = Position.query.get(pos_id)
             if pos:
                 db.session.add(UserPosition(user_id=user.id, position_id=pos_id, assigned_at=datetime.utcnow()))
+        invalidate_user_positions(user.id)
 
-        db.session.commit()
+        new_values = {key: value for key, value in data.items() if key != 'password'}
+        new_values['password'] = 'set'
+        record_audit('create_user', 'user', user.id, old_values={}, new_values=new_values, user_id=current_user_id)
 
-        audit_log = AuditLog(
-            user_id=current_user_id,
-            action='create_user',
-            entity_type='user',
-            entity_id=user.id,
-            old_values={},
-            new_values=data,
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(audit_log)
         db.session.commit()
 
         return jsonify({"message": f"Пользователь {user.username} создан"})
 
     except ValidationError as e:
         return jsonify({"error": "Некорректные данные", "details": e.messages}), 400
+    except PasswordPoolBusy:
+        db.session.rollback()
+        return jsonify({"error": "Сервер перегружен, повторите позже"}), 503
     except IntegrityError:
         db.session.rollback()
         return jsonify({"error": "Имя пользователя или email уже существуют"}), 400
@@ -154,6 +195,7 @@ def update_user(user_id):
 
         if 'positions' in data:
             UserPosition.query.filter_by(user_id=user.id).delete()
+            invalidate_user_positions(user.id)
             for pos_id in data['positions']:
                 pos = Position.query.get(pos_id)
                 if pos:
@@ -172,22 +214,16 @@ def update_user(user_id):
         if 'new_password' in data:
             new_values['password'] = 'changed'
 
-        audit_log = AuditLog(
-            user_id=current_user_id,
-            action='update_user',
-            entity_type='user',
-            entity_id=user.id,
-            old_values=old_values,
-            new_values=new_values,
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(audit_log)
+        record_audit('update_user', 'user', user.id, old_values=old_values, new_values=new_values, user_id=current_user_id)
         db.session.commit()
 
         return jsonify({"message": f"Пользователь {user.username} обновлен"})
 
     except ValidationError as e:
         return jsonify({"error": "Некорректные данные", "details": e.messages}), 400
+    except PasswordPoolBusy:
+        db.session.rollback()
+        return jsonify({"error": "Сервер перегружен, повторите позже"}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Внутренняя ошибка сервера", "details": str(e)}), 500
@@ -198,11 +234,7 @@ def get_positions():
     try:
         identity = get_jwt_identity()
         
-        positions = Position.query.all()
-        return jsonify([{
-            'id': p.id,
-            'title': p.title
-        } for p in positions]), 200
+        return conditional_json(position_registry.etag(), position_registry.items)
 
     except Exception as e:
         print(f"Error in get_positions: {str(e)}")
@@ -243,6 +275,7 @@ def create_position():
             created_at=datetime.utcnow()
         )
         db.session.add(position)
+        position_registry.invalidate()
         db.session.commit()
 
         return jsonify({
@@ -273,7 +306,9 @@ def delete_position(position_id):
             return jsonify({"error": "Нельзя удалить системную должность"}), 403
 
         UserPosition.query.filter_by(position_id=position_id).delete()
+        invalidate_user_positions()
         db.session.delete(position)
+        position_registry.invalidate()
         db.session.commit()
 
         return jsonify({"message": "Должность удалена"}), 200
@@ -281,4 +316,144 @@ def delete_position(position_id):
     except Exception as e:
         db.session.rollback()
         print(f"Error in delete_position: {str(e)}")
-        return jsonify({"error": "Ошибка удаления", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "Ошибка удаления", "details": str(e)}), 500
+
+
+AUDIT_EXPORT_CHUNK = 1000
+AUDIT_EXPORT_COLUMNS = ['id', 'timestamp', 'user_id', 'action', 'entity_type', 'entity_id', 'old_values', 'new_values']
+
+def _audit_filters():
+    """Условия отбора журнала аудита из строки запроса.
+
+    Фильтры entity_type, entity_id, user_id, action, since, until. Выборки
+    по entity_type вместе с entity_id, по user_id, по action или только по
+    времени читаются по индексу сразу в порядке (timestamp, id); фильтр по
+    одному entity_type индекс сужает, но требует сортировки.
+    """
+    filters = []
+    if request.args.get('entity_type'):
+        filters.append(AuditLog.entity_type == request.args['entity_type'])
+    if request.args.get('entity_id', type=int) is not None:
+        filters.append(AuditLog.entity_id == request.args.get('entity_id', type=int))
+    if request.args.get('user_id', type=int) is not None:
+        filters.append(AuditLog.user_id == request.args.get('user_id', type=int))
+    if request.args.get('action'):
+        filters.append(AuditLog.action == request.args['action'])
+    since = parse_datetime('since')
+    if since:
+        filters.append(AuditLog.timestamp >= since)
+    until = parse_datetime('until')
+    if until:
+        filters.append(AuditLog.timestamp < until)
+    return filters
+
+def _audit_query(filters):
+    return db.session.query(
+        AuditLog.id, AuditLog.timestamp, AuditLog.user_id, AuditLog.action,
+        AuditLog.entity_type, AuditLog.entity_id, AuditLog.old_values, AuditLog.new_values
+    ).filter(*filters)
+
+def _serialize_audit(entry):
+    return {
+        'id': entry.id,
+        'timestamp': entry.timestamp.isoformat() if entry.timestamp else None,
+        'user_id': entry.user_id,
+        'action': entry.action,
+        'entity_type': entry.entity_type,
+        'entity_id': entry.entity_id,
+        'old_values': entry.old_values,
+        'new_values': entry.new_values
+    }
+
+@admin_bp.route('/audit', methods=['GET'])
+@jwt_required()
+def get_audit_log():
+    """Журнал аудита, новые записи первыми (доступно только администратору).
+
+    Фильтры: entity_type, entity_id, user_id, action, since, until (ISO 8601);
+    limit и cursor (постранично по (timestamp, id)).
+    """
+    current_user_id = int(get_jwt_identity())
+    if not is_admin(current_user_id):
+        return jsonify({"error": "Требуются права администратора"}), 403
+    
+    try:
+        limit = parse_limit(default=100, maximum=500)
+        cursor = decode_cursor(datetime, int)
+        query = _audit_query(_audit_filters())
+    except InvalidListingParams as e:
+        return jsonify({"error": str(e)}), 400
+    
+    flush_audit()
+    if cursor:
+        query = query.filter(tuple_(AuditLog.timestamp, AuditLog.id) < cursor)
+    entries = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit + 1).all()
+    entries, next_cursor = paginate(entries, limit, lambda e: (e.timestamp, e.id))
+    
+    return with_next_cursor(jsonify([_serialize_audit(e) for e in entries]), next_cursor)
+
+@admin_bp.route('/audit/export', methods=['GET'])
+@jwt_required()
+def export_audit_log():
+    """Выгрузка журнала аудита в NDJSON или CSV (доступно только администратору).
+
+    Те же фильтры, что у /admin/audit; format=ndjson (по умолчанию) или csv.
+    Записи идут в хронологическом порядке и читаются из базы порциями по
+    ключу (timestamp, id), поэтому память не растёт с размером выгрузки.
+    """
+    current_user_id = int(get_jwt_identity())
+    if not is_admin(current_user_id):
+        return jsonify({"error": "Требуются права администратора"}), 403
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"error": "format должен быть ndjson или csv"}), 400
+    try:
+        filters = _audit_filters()
+    except InvalidListingParams as e:
+        return jsonify({"error": str(e)}), 400
+    
+    flush_audit()
+    app = current_app._get_current_object()
+    
+    def chunks():
+        last_key = None
+        while True:
+            with app.app_context():
+                query = _audit_query(filters)
+                if last_key:
+                    query = query.filter(tuple_(AuditLog.timestamp, AuditLog.id) > last_key)
+                entries = query.order_by(AuditLog.timestamp, AuditLog.id).limit(AUDIT_EXPORT_CHUNK).all()
+            if not entries:
+                return
+            last_key = (entries[-1].timestamp, entries[-1].id)
+            yield entries
+    
+    def generate_ndjson():
+        for entries in chunks():
+            yield ''.join(
+                json.dumps(_serialize_audit(e), ensure_ascii=False) + '\n' for e in entries
+            )
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(AUDIT_EXPORT_COLUMNS)
+        for entries in chunks():
+            for e in entries:
+                row = _serialize_audit(e)
+                row['old_values'] = json.dumps(row['old_values'], ensure_ascii=False)
+                row['new_values'] = json.dumps(row['new_values'], ensure_ascii=False)
+                writer.writerow([row[column] for column in AUDIT_EXPORT_COLUMNS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=audit.{export_format}'
+    })
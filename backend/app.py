@@ -2,6 +2,13 @@ from flask import Flask, jsonify, request
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from models import db
+from database import database_config, init_database
+from permissions import configure_permission_cache
+from reference import init_reference_data
+from outbox import init_outbox
+from audit import init_audit
+from metrics import init_metrics
+from passwords import init_passwords, DEFAULT_HASH_METHOD
 from datetime import timedelta
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -14,33 +21,66 @@ def create_app():
 
     load_dotenv()
     
+    app.config.update(database_config())
     app.config.update({
-        'SQLALCHEMY_DATABASE_URI': 'sqlite:///db.sqlite',
         'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY'),
         'JWT_ALGORITHM': 'HS256',
         'JWT_HEADER_TYPE': 'Bearer',
         'JWT_TOKEN_LOCATION': ['headers'],
         'JWT_IDENTITY_CLAIM': 'sub',  
-        'JWT_ACCESS_TOKEN_EXPIRES': timedelta(hours=5)
+        'JWT_ACCESS_TOKEN_EXPIRES': timedelta(hours=5),
+        'PERMISSION_CACHE_SIZE': int(os.getenv('PERMISSION_CACHE_SIZE', 10000)),
+        'PERMISSION_CACHE_TTL': int(os.getenv('PERMISSION_CACHE_TTL', 30)),
+        'REFERENCE_DATA_TTL': int(os.getenv('REFERENCE_DATA_TTL', 300)),
+        'OUTBOX_MODE': os.getenv('OUTBOX_MODE', 'thread'),
+        'OUTBOX_POLL_INTERVAL': float(os.getenv('OUTBOX_POLL_INTERVAL', 5)),
+        'OUTBOX_BATCH_SIZE': int(os.getenv('OUTBOX_BATCH_SIZE', 100)),
+        'OUTBOX_MAX_ATTEMPTS': int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5)),
+        'NOTIFICATION_STREAM_POLL_INTERVAL': float(os.getenv('NOTIFICATION_STREAM_POLL_INTERVAL', 15)),
+        'NOTIFICATION_STREAM_MAX_AGE': float(os.getenv('NOTIFICATION_STREAM_MAX_AGE', 600)),
+        'NOTIFICATION_STREAM_BACKLOG': int(os.getenv('NOTIFICATION_STREAM_BACKLOG', 200)),
+        'NOTIFICATION_STREAM_RETRY_MS': int(os.getenv('NOTIFICATION_STREAM_RETRY_MS', 3000)),
+        'NOTIFICATION_STREAM_REORDER_WINDOW': float(os.getenv('NOTIFICATION_STREAM_REORDER_WINDOW', 10)),
+        'NOTIFICATION_STREAM_TICKET_TTL': int(os.getenv('NOTIFICATION_STREAM_TICKET_TTL', 60)),
+        'AUDIT_MODE': os.getenv('AUDIT_MODE', 'buffered'),
+        'AUDIT_BATCH_SIZE': int(os.getenv('AUDIT_BATCH_SIZE', 200)),
+        'AUDIT_FLUSH_INTERVAL': float(os.getenv('AUDIT_FLUSH_INTERVAL', 2)),
+        'AUDIT_SPOOL_PATH': os.getenv('AUDIT_SPOOL_PATH', os.path.join(app.instance_path, 'audit_spool.jsonl')),
+        'SLOW_REQUEST_MS': float(os.getenv('SLOW_REQUEST_MS', 500)),
+        'METRICS_TOKEN': os.getenv('METRICS_TOKEN'),
+        'PASSWORD_HASH_METHOD': os.getenv('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+        'PASSWORD_POOL': os.getenv('PASSWORD_POOL', 'process'),
+        'PASSWORD_POOL_WORKERS': int(os.getenv('PASSWORD_POOL_WORKERS', 0)),
+        'PASSWORD_POOL_MAX_PENDING': int(os.getenv('PASSWORD_POOL_MAX_PENDING', 32)),
+        'PASSWORD_POOL_TIMEOUT': float(os.getenv('PASSWORD_POOL_TIMEOUT', 10)),
+        'BATCH_MAX_REQUESTS': int(os.getenv('BATCH_MAX_REQUESTS', 100))
     })
     
-    db.init_app(app)
+    init_database(app)
+    configure_permission_cache(app)
+    init_reference_data(app)
+    init_outbox(app)
+    init_audit(app)
+    init_metrics(app)
+    init_passwords(app)
     jwt = JWTManager(app)
-    migrate = Migrate(app, db)  
+    migrate = Migrate(app, db, render_as_batch=True)
 
-    CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}})
+    CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}}, expose_headers=['ETag', 'X-Next-Cursor'])
     
     from auth import auth_bp
     from projects import projects_bp
     from admin import admin_bp
     from tasks import tasks_bp
     from notifications import notifications_bp
+    from batch import batch_bp
     
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(projects_bp, url_prefix='/projects')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(tasks_bp, url_prefix='/tasks')
     app.register_blueprint(notifications_bp, url_prefix='/notifications')
+    app.register_blueprint(batch_bp, url_prefix='/batch')
 
     @app.route("/")
     def helloWorld():
@@ -49,9 +89,7 @@ def create_app():
     
     @app.before_request
     def log_request():
-        print(f"Request: {request.method} {request.path} from {request.origin}")
         if request.method == 'OPTIONS':
-            print("Handling OPTIONS request")
             resp = app.make_response('')
             resp.headers['Access-Control-Allow-Origin'] = 'http://localhost:3000'
             resp.headers['Access-Control-Allow-Methods'] = 'GET, POST, PATCH, DELETE, PUT, OPTIONS'
@@ -0,0 +1,203 @@
+import atexit
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert
+from models import db, AuditLog
+from session_hooks import after_commit
+
+try:
+    import fcntl
+except ImportError:  # Windows: спул разделяется только потоками одного процесса
+    fcntl = None
+
+# Режимы записи журнала аудита (AUDIT_MODE):
+# buffered — записи копятся в памяти после коммита запроса и пишутся пачками
+#            фоновым потоком; при недоступной базе уходят в файл-спул;
+# sync — запись добавляется в транзакцию запроса (прежнее поведение).
+AUDIT_MODES = ('buffered', 'sync')
+
+
+def record_audit(action, entity_type, entity_id=None, old_values=None, new_values=None, user_id=None):
+    """Добавляет запись в журнал аудита.
+
+    Запись попадает в журнал, только если текущая транзакция закоммичена.
+    Время записи фиксируется в момент вызова.
+    """
+    entry = {
+        'user_id': user_id,
+        'action': action,
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'old_values': old_values,
+        'new_values': new_values,
+        'timestamp': datetime.utcnow()
+    }
+    writer = current_app.extensions.get('audit')
+    if writer is None or writer.mode == 'sync':
+        db.session.add(AuditLog(updated_at=entry['timestamp'], **entry))
+        return
+    after_commit(lambda: writer.enqueue(entry))
+
+
+def flush_audit():
+    """Записывает в базу всё, что накоплено в буфере журнала аудита."""
+    writer = current_app.extensions.get('audit')
+    if writer is not None:
+        writer.flush()
+
+
+class AuditWriter:
+    """Пакетная запись журнала аудита.
+
+    Записи пишутся строго в порядке коммитов: одновременно работает только
+    один сброс, а спул всегда дописывается и вычитывается раньше буфера.
+    Сброс запускается, когда в буфере набирается AUDIT_BATCH_SIZE записей,
+    раз в AUDIT_FLUSH_INTERVAL секунд и при завершении процесса. Если база
+    недоступна, несброшенные записи дописываются в AUDIT_SPOOL_PATH (JSON
+    по строке на запись) и переносятся в базу при следующем удачном сбросе.
+    Спул общий для всех процессов приложения, поэтому дописывание, перенос и
+    перезапись спула идут под исключительной блокировкой файла
+    AUDIT_SPOOL_PATH.lock.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.mode = app.config['AUDIT_MODE']
+        self.batch_size = app.config['AUDIT_BATCH_SIZE']
+        self.flush_interval = app.config['AUDIT_FLUSH_INTERVAL']
+        self.spool_path = app.config['AUDIT_SPOOL_PATH']
+        self._buffer = deque()
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread = None
+
+    def enqueue(self, entry):
+        with self._buffer_lock:
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+        self._start()
+        if full:
+            self._event.set()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._buffer_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._event.wait(self.flush_interval)
+            self._event.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception('Ошибка записи журнала аудита')
+
+    def _take(self):
+        with self._buffer_lock:
+            count = min(len(self._buffer), self.batch_size)
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _take_all(self):
+        with self._buffer_lock:
+            entries = list(self._buffer)
+            self._buffer.clear()
+            return entries
+
+    def flush(self):
+        """Переносит спул и буфер в базу пачками по batch_size записей."""
+        with self._flush_lock, self.app.app_context():
+            if not self._replay_spool():
+                self._spool(self._take_all())
+                return
+            while True:
+                batch = self._take()
+                if not batch:
+                    return
+                if not self._insert(batch):
+                    self._spool(batch + self._take_all())
+                    return
+
+    def _insert(self, entries):
+        try:
+            db.session.execute(insert(AuditLog), [
+                dict(entry, updated_at=entry['timestamp']) for entry in entries
+            ])
+            db.session.commit()
+            return True
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception('Журнал аудита недоступен, записи сохранены в спул')
+            return False
+
+    @contextmanager
+    def _spool_lock(self):
+        os.makedirs(os.path.dirname(self.spool_path) or '.', exist_ok=True)
+        with open(self.spool_path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _spool(self, entries):
+        if entries:
+            with self._spool_lock():
+                self._write_spool(entries)
+
+    def _write_spool(self, entries, mode='a'):
+        path = self.spool_path if mode == 'a' else self.spool_path + '.tmp'
+        with open(path, mode, encoding='utf-8') as spool:
+            for entry in entries:
+                spool.write(json.dumps(
+                    dict(entry, timestamp=entry['timestamp'].isoformat()),
+                    ensure_ascii=False, default=str
+                ) + '\n')
+            spool.flush()
+            os.fsync(spool.fileno())
+        if path != self.spool_path:
+            os.replace(path, self.spool_path)
+
+    def _replay_spool(self):
+        """Переносит спул в базу; False, если база по-прежнему недоступна."""
+        if not os.path.exists(self.spool_path):
+            return True
+        with self._spool_lock():
+            # Пока ждали блокировку, спул мог перенести другой процесс.
+            if not os.path.exists(self.spool_path):
+                return True
+            return self._replay_locked()
+
+    def _replay_locked(self):
+        with open(self.spool_path, encoding='utf-8') as spool:
+            entries = [json.loads(line) for line in spool if line.strip()]
+        for entry in entries:
+            entry['timestamp'] = datetime.fromisoformat(entry['timestamp'])
+        for start in range(0, len(entries), self.batch_size):
+            if not self._insert(entries[start:start + self.batch_size]):
+                # Уже записанные пачки убираются из спула, чтобы не задвоить их.
+                self._write_spool(entries[start:], mode='w')
+                return False
+        os.remove(self.spool_path)
+        return True
+
+
+def init_audit(app):
+    """Регистрирует в приложении запись журнала аудита."""
+    if app.config['AUDIT_MODE'] not in AUDIT_MODES:
+        raise ValueError(f"AUDIT_MODE должен быть одним из: {', '.join(AUDIT_MODES)}")
+    writer = AuditWriter(app)
+    app.extensions['audit'] = writer
+    atexit.register(writer.flush)
+    return writer
@@ -3,6 +3,9 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from models import db, User, Position, UserPosition
 from datetime import datetime
 from marshmallow import Schema, fields, validate, ValidationError
+from permissions import invalidate_user_positions, ADMIN_POSITION
+from reference import positions
+from passwords import PasswordPoolBusy
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -17,8 +20,18 @@ def login():
     data = request.get_json()
     user = User.query.filter_by(username=data['username']).first()
     
-    if not user or not user.check_password(data['password']):
-        return jsonify({"error": "Данные введены неверно"}), 401
+    try:
+        if not user or not user.check_password(data['password']):
+            return jsonify({"error": "Данные введены неверно"}), 401
+        
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
+    except PasswordPoolBusy:
+        db.session.rollback()
+        response = jsonify({"error": "Сервер перегружен, повторите вход позже"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
     
     access_token = create_access_token(identity=str(user.id))
     return jsonify(access_token=access_token, token_type="Bearer")
@@ -79,8 +92,7 @@ def update_my_positions():
         data = request.get_json()
         requested_positions = data.get('positions', [])
 
-        admin_position = Position.query.filter_by(title='Администратор').first()
-        admin_position_id = admin_position.id if admin_position else None
+        admin_position_id = positions.id_for(ADMIN_POSITION)
 
         current_positions = {up.position_id for up in UserPosition.query.filter_by(user_id=user_id).all()}
         is_currently_admin = admin_position_id in current_positions
@@ -96,6 +108,7 @@ def update_my_positions():
             return jsonify({"error": "Одна или несколько должностей не существуют"}), 400
 
         UserPosition.query.filter_by(user_id=user_id).delete()
+        invalidate_user_positions(user_id)
 
         for pos_id in requested_positions:
             up = UserPosition(user_id=user_id, position_id=pos_id)
@@ -0,0 +1,214 @@
+import re
+from urllib.parse import urlsplit
+from flask import Blueprint, current_app, g, request, jsonify
+from flask_jwt_extended import jwt_required
+from marshmallow import Schema, fields, validate, ValidationError
+from sqlalchemy.orm import Session
+from werkzeug.test import EnvironBuilder
+from models import db
+from session_hooks import defer_after_commit, finish_deferred
+from serialization import json_response
+
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+RETURNED_HEADERS = ('ETag', 'X-Next-Cursor', 'Location', 'Retry-After')
+# {{имя.поле.0.поле}} — значение из JSON-ответа более раннего запроса пакета.
+REFERENCE = re.compile(r'\{\{\s*([A-Za-z_][\w-]*)((?:\.[\w-]+)*)\s*\}\}')
+
+
+class BatchItemSchema(Schema):
+    id = fields.Str(validate=validate.Regexp(r'^[A-Za-z_][\w-]*$'))
+    method = fields.Str(required=True, validate=validate.OneOf(BATCH_METHODS))
+    path = fields.Str(required=True, validate=validate.Regexp(r'^/'))
+    body = fields.Raw(allow_none=True)
+    headers = fields.Dict(keys=fields.Str(), values=fields.Str())
+
+
+class BatchSchema(Schema):
+    transaction = fields.Boolean(load_default=False)
+    requests = fields.List(fields.Nested(BatchItemSchema), required=True, validate=validate.Length(min=1))
+
+
+class UnresolvedReference(Exception):
+    pass
+
+
+def _lookup(results, name, keys):
+    if name not in results:
+        raise UnresolvedReference(f'Нет успешного ответа запроса «{name}»')
+    value = results[name]
+    for key in keys:
+        if isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        elif isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            raise UnresolvedReference(f'В ответе запроса «{name}» нет поля «{key}»')
+    return value
+
+
+def resolve_references(value, results):
+    """Подставляет ссылки {{имя.путь}} из ответов предыдущих запросов.
+
+    Строка, целиком состоящая из одной ссылки, заменяется значением как есть
+    (число остаётся числом); внутри строки значение подставляется текстом.
+    """
+    if isinstance(value, str):
+        match = REFERENCE.fullmatch(value)
+        if match:
+            return _lookup(results, match.group(1), match.group(2).split('.')[1:])
+        return REFERENCE.sub(
+            lambda m: str(_lookup(results, m.group(1), m.group(2).split('.')[1:])), value
+        )
+    if isinstance(value, list):
+        return [resolve_references(v, results) for v in value]
+    if isinstance(value, dict):
+        return {k: resolve_references(v, results) for k, v in value.items()}
+    return value
+
+
+def _response_body(response):
+    if response.is_json:
+        return response.get_json()
+    data = response.get_data(as_text=True)
+    return data or None
+
+
+def _dispatch(app, method, path, body, headers):
+    """Выполняет вложенный запрос через обычную обработку Flask.
+
+    Вложенный контекст запроса использует тот же контекст приложения, что и
+    пакет: общие сессия базы и flask.g (в том числе memo проверок прав).
+    Необработанная ошибка превращается в ответ 500 этого запроса, как в
+    обычной обработке Flask (с after_request), а не роняет весь пакет.
+    """
+    environ = EnvironBuilder(
+        path=path, method=method, headers=headers, json=body, base_url=request.url_root
+    ).get_environ()
+    depth = len(g.get('_metrics', ()))
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            db.session.rollback()
+            response = app.handle_exception(e)
+    # Если after_request упал раньше метрик, запись вложенного запроса
+    # осталась бы на стеке и досталась бы самому пакету.
+    del g.get('_metrics', [])[depth:]
+    if response.is_streamed:
+        response.close()
+        return 400, {'error': 'Потоковые ответы в пакете не поддерживаются'}, {}
+    returned = {name: response.headers[name] for name in RETURNED_HEADERS if name in response.headers}
+    return response.status_code, _response_body(response), returned
+
+
+def _run_requests(items, stop_on_error, transaction=None):
+    """Выполняет запросы по порядку; возвращает результаты и номер упавшего запроса."""
+    app = current_app._get_current_object()
+    authorization = request.headers.get('Authorization')
+    results = []
+    bodies = {}
+
+    for index, item in enumerate(items):
+        headers = dict(item.get('headers') or {})
+        if authorization:
+            headers['Authorization'] = authorization
+        try:
+            path = resolve_references(item['path'], bodies)
+            body = resolve_references(item.get('body'), bodies)
+        except UnresolvedReference as e:
+            status, response_body, returned = 424, {'error': str(e)}, {}
+        else:
+            if urlsplit(path).path.rstrip('/') == '/batch':
+                status, response_body, returned = 400, {'error': 'Вложенные пакеты не поддерживаются'}, {}
+            else:
+                status, response_body, returned = _dispatch(app, item['method'], path, body, headers)
+
+        result = {'id': item.get('id'), 'status': status, 'body': response_body}
+        if returned:
+            result['headers'] = returned
+        results.append(result)
+
+        failed = status >= 400 or (transaction is not None and not transaction.is_active)
+        if not failed and item.get('id'):
+            bodies[item['id']] = response_body
+        if failed and stop_on_error:
+            return results, index
+    return results, None
+
+
+def _run_in_transaction(items):
+    """Выполняет пакет в одной транзакции базы.
+
+    На время пакета сессия текущего контекста заменяется сессией, которая
+    присоединена к внешней транзакции: commit() во вложенных запросах лишь
+    сбрасывает изменения в базу, а откат любого из них откатывает всё.
+    Отложенные до коммита действия (уведомления, аудит) копятся и
+    выполняются после настоящего коммита; при отмене отбрасываются.
+    """
+    registry = db.session.registry
+    previous = registry() if registry.has() else None
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode='rollback_only')
+    defer_after_commit(session)
+    registry.set(session)
+
+    committed = False
+    try:
+        try:
+            results, failed_index = _run_requests(items, stop_on_error=True, transaction=transaction)
+        finally:
+            if previous is None:
+                registry.clear()
+            else:
+                registry.set(previous)
+            session.close()
+        if failed_index is None:
+            transaction.commit()
+            committed = True
+    finally:
+        if transaction.is_active:
+            transaction.rollback()
+        connection.close()
+        finish_deferred(session, committed)
+    return results, failed_index
+
+
+@batch_bp.route('/', methods=['POST'])
+@jwt_required()
+def run_batch():
+    """Выполняет упорядоченный список запросов к API за один HTTP-вызов.
+
+    Тело: {"transaction": bool, "requests": [{"id", "method", "path", "body",
+    "headers"}]}. Запросы выполняются от имени вызывающего (его заголовок
+    Authorization); путь и тело могут ссылаться на ответы предыдущих
+    запросов: "/projects/{{project.id}}/stages". Ответ — список результатов
+    {"id", "status", "body", "headers"} в порядке запросов.
+
+    Без transaction каждый запрос фиксируется сам, ошибки не прерывают пакет
+    (запросы со ссылкой на неуспешный ответ получают 424). С transaction
+    пакет выполняется целиком или никак: первая ошибка откатывает всё и
+    возвращает 409 с результатами до ошибки включительно.
+    """
+    try:
+        data = BatchSchema().load(request.get_json())
+    except ValidationError as e:
+        return jsonify({"error": "Некорректные данные", "details": e.messages}), 400
+
+    max_requests = current_app.config['BATCH_MAX_REQUESTS']
+    if len(data['requests']) > max_requests:
+        return jsonify({"error": f"В пакете не больше {max_requests} запросов"}), 400
+
+    if not data['transaction']:
+        results, _ = _run_requests(data['requests'], stop_on_error=False)
+        return json_response(results)
+
+    results, failed_index = _run_in_transaction(data['requests'])
+    if failed_index is not None:
+        return json_response({
+            "error": f"Пакет отменён: запрос {failed_index} завершился с кодом {results[failed_index]['status']}",
+            "results": results
+        }, status=409)
+    return json_response(results)
@@ -0,0 +1,114 @@
+"""Замер создания проекта отдельными вызовами и одним пакетом /batch.
+
+Сценарий повторяет форму создания проекта в админке: проект, этапы, задачи
+этапов и участники. Он выполняется тремя способами: отдельными HTTP-вызовами,
+пакетом без транзакции и пакетом в одной транзакции. Для каждого способа
+печатаются число HTTP-вызовов, время на сервере, число SQL-запросов и оценка
+полного времени с задержкой сети --rtt на каждый вызов (тестовый клиент
+сеть не моделирует).
+
+Запуск из каталога backend:
+    python -m benchmarks.batch --stages 5 --tasks 10 --members 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from sqlalchemy import event
+
+
+def project_requests(title, stages, tasks, members):
+    requests = [{'id': 'project', 'method': 'POST', 'path': '/projects/', 'body': {'title': title}}]
+    for s in range(stages):
+        requests.append({'id': f's{s}', 'method': 'POST', 'path': '/projects/{{project.id}}/stages',
+                         'body': {'title': f'Этап {s}', 'sequence': s}})
+        requests.extend({'method': 'POST', 'path': '/tasks/', 'body': {'stage_id': f'{{{{s{s}.id}}}}', 'title': f'Задача {t}'}}
+                        for t in range(tasks))
+    requests.extend({'method': 'POST', 'path': '/projects/{{project.id}}/members', 'body': {'user_id': user_id}}
+                    for user_id in range(2, members + 2))
+    return requests
+
+
+def run_sequential(client, headers, requests):
+    """Отдельные вызовы; ссылки на id подставляет «клиент», как это делает фронтенд."""
+    from batch import resolve_references
+
+    bodies = {}
+    for item in requests:
+        response = client.open(resolve_references(item['path'], bodies), method=item['method'],
+                               json=resolve_references(item['body'], bodies), headers=headers)
+        assert response.status_code < 400, response.get_json()
+        if item.get('id'):
+            bodies[item['id']] = response.get_json()
+    return len(requests)
+
+
+def run_batch(client, headers, requests, transaction):
+    response = client.post('/batch', json={'transaction': transaction, 'requests': requests}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stages', type=int, default=5)
+    parser.add_argument('--tasks', type=int, default=10, help='задач на этап')
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--rtt', type=float, default=30, help='задержка сети на вызов, мс')
+    args = parser.parse_args()
+
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-of-sufficient-length')
+    os.environ.setdefault('OUTBOX_MODE', 'inline')
+    os.environ.setdefault('AUDIT_MODE', 'sync')
+    os.environ.setdefault('PASSWORD_POOL', 'inline')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+
+        from flask_jwt_extended import create_access_token
+        from app import create_app
+        import models
+        from benchmarks.seed import seed_organization
+
+        app = create_app()
+        with app.app_context():
+            models.db.create_all()
+            seed_organization(models.db, models, users=args.members + 1, projects=1, members=2,
+                              stages=1, tasks=1, raci=1, notifications=1)
+            headers = {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+            engine = models.db.engine
+
+        counter = {'queries': 0}
+
+        def count_query(*_):
+            counter['queries'] += 1
+
+        event.listen(engine, 'before_cursor_execute', count_query)
+        client = app.test_client()
+        modes = [
+            ('отдельные вызовы', lambda r: run_sequential(client, headers, r)),
+            ('пакет', lambda r: run_batch(client, headers, r, False)),
+            ('пакет в транзакции', lambda r: run_batch(client, headers, r, True)),
+        ]
+
+        print(f"{'способ':<20} {'HTTP':>5} {'мс':>8} {'SQL':>6} {'с RTT, мс':>10}")
+        for name, run in modes:
+            timings = []
+            for i in range(args.iterations):
+                requests = project_requests(f'{name} {i}', args.stages, args.tasks, args.members)
+                counter['queries'] = 0
+                started = time.perf_counter()
+                calls = run(requests)
+                timings.append(time.perf_counter() - started)
+            elapsed = statistics.median(timings) * 1000
+            print(f'{name:<20} {calls:>5} {elapsed:>8.1f} {counter["queries"]:>6} {elapsed + calls * args.rtt:>10.1f}')
+
+        event.remove(engine, 'before_cursor_execute', count_query)
+        with app.app_context():
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Замер пропускной способности конкурентной записи в SQLite.
+
+Сравнивает настройки SQLite по умолчанию (SQLITE_TUNING=0) с WAL и прочими
+PRAGMA из database.py на одинаково заполненной базе.
+
+Запуск из каталога backend:
+    python -m benchmarks.db_concurrency --threads 8 --writes 200
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert, update
+from sqlalchemy.exc import OperationalError
+
+
+def seed(db, models, tasks=5000):
+    now = datetime.utcnow()
+    db.session.execute(insert(models.User), [
+        {'username': f'bench{i}', 'full_name': f'Bench {i}', 'password_hash': 'x',
+         'created_at': now, 'updated_at': now}
+        for i in range(50)
+    ])
+    db.session.execute(insert(models.Project), [
+        {'title': 'Benchmark', 'created_by': 1, 'created_at': now, 'updated_at': now}
+    ])
+    db.session.execute(insert(models.ProjectStage), [
+        {'project_id': 1, 'title': f'Stage {i}', 'sequence': i, 'created_at': now, 'updated_at': now}
+        for i in range(20)
+    ])
+    db.session.execute(insert(models.Task), [
+        {'stage_id': i % 20 + 1, 'title': f'Task {i}', 'priority': 'medium', 'is_completed': False,
+         'created_at': now, 'updated_at': now}
+        for i in range(tasks)
+    ])
+    db.session.commit()
+
+
+def run(tuned, threads, writes, workdir):
+    path = os.path.join(workdir, f"bench_{'tuned' if tuned else 'default'}.sqlite")
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['SQLITE_TUNING'] = '1' if tuned else '0'
+
+    from app import create_app
+    import models
+
+    app = create_app()
+    with app.app_context():
+        models.db.create_all()
+        seed(models.db, models)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        for i in range(writes):
+            started = time.perf_counter()
+            with app.app_context():
+                try:
+                    now = datetime.utcnow()
+                    models.db.session.execute(insert(models.Notification).values(
+                        user_id=worker_id % 50 + 1,
+                        message=f'bench {worker_id}/{i}',
+                        is_read=False,
+                        created_at=now,
+                        updated_at=now
+                    ))
+                    models.db.session.execute(
+                        update(models.Task)
+                        .where(models.Task.id == (worker_id * writes + i) % 5000 + 1)
+                        .values(updated_at=now)
+                    )
+                    models.db.session.commit()
+                except OperationalError as e:
+                    models.db.session.rollback()
+                    with lock:
+                        errors.append(str(e.orig))
+                    continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        models.db.engine.dispose()
+
+    latencies.sort()
+    return {
+        'mode': 'tuned' if tuned else 'default',
+        'commits': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200, help='транзакций на поток')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(tuned, args.threads, args.writes, workdir) for tuned in (False, True)]
+
+    print(f"{'режим':<8} {'коммитов':>9} {'ошибок':>7} {'tx/с':>9} {'p50, мс':>9} {'p95, мс':>9}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['commits']:>9} {r['errors']:>7} {r['throughput']:>9.1f} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Замер горячих маршрутов API с бюджетом SQL-запросов.
+
+Заполняет временную базу генератором из benchmarks.seed (или берёт готовую
+через --db), прогоняет каждый маршрут через тестовый клиент Flask и печатает
+p50/p95, наибольшее число SQL-запросов на вызов и, для маршрутов с ETag,
+число запросов на ответ 304. Если маршрут превысил свой
+бюджет запросов, команда завершается с кодом 1.
+
+Запуск из каталога backend:
+    python -m benchmarks.endpoints --iterations 50 --users 500 --projects 40
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from sqlalchemy import event
+
+from benchmarks.seed import add_arguments, seed_options
+
+# (название, путь, бюджет SQL-запросов на вызов). Бюджет проверяется и на
+# первом вызове, когда кэши прав и справочников ещё пусты.
+ENDPOINTS = [
+    ('dashboard', '/projects/dashboard', 2),
+    ('projects', '/projects/', 2),
+    ('project', '/projects/1', 4),
+    ('project_stages', '/projects/1/stages', 3),
+    ('project_tasks', '/tasks/?project_id=1', 2),
+    ('project_members', '/projects/1/members', 2),
+    ('raci_matrix', '/projects/1/raci-matrix', 4),
+    ('admin_users', '/admin/users', 3),
+    ('admin_users_search', '/admin/users?q=user0001', 3),
+    ('notifications', '/notifications/notifications', 1),
+    ('unread_count', '/notifications/unread-count', 1),
+    ('roles', '/projects/roles', 0),
+]
+
+
+def percentile(sorted_values, fraction):
+    index = max(int(round(len(sorted_values) * fraction)) - 1, 0)
+    return sorted_values[index]
+
+
+def run(app, db, iterations, warmup):
+    from flask_jwt_extended import create_access_token
+
+    counter = {'queries': 0}
+
+    def count_query(*args):
+        counter['queries'] += 1
+
+    with app.app_context():
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count_query)
+        headers = {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+    client = app.test_client()
+
+    results = []
+    for name, path, budget in ENDPOINTS:
+        timings = []
+        max_queries = 0
+        status = None
+        for i in range(warmup + iterations):
+            counter['queries'] = 0
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            elapsed = time.perf_counter() - started
+            status = response.status_code
+            max_queries = max(max_queries, counter['queries'])
+            if i >= warmup:
+                timings.append(elapsed)
+        timings.sort()
+
+        # Повторная проверка с ETag последнего ответа: сколько SQL стоит 304.
+        revalidate = None
+        if response.headers.get('ETag'):
+            counter['queries'] = 0
+            response = client.get(path, headers={**headers, 'If-None-Match': response.headers['ETag']})
+            revalidate = counter['queries'] if response.status_code == 304 else None
+        results.append({
+            'name': name,
+            'status': status,
+            'p50_ms': statistics.median(timings) * 1000,
+            'p95_ms': percentile(timings, 0.95) * 1000,
+            'queries': max_queries,
+            'budget': budget,
+            'revalidate': revalidate,
+        })
+
+    event.remove(engine, 'before_cursor_execute', count_query)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='готовая база SQLite (по умолчанию временная, заполняется заново)')
+    parser.add_argument('--iterations', type=int, default=50, help='замеров на маршрут')
+    parser.add_argument('--warmup', type=int, default=3, help='вызовов до начала замера')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-of-sufficient-length')
+    os.environ.setdefault('OUTBOX_MODE', 'inline')
+    os.environ.setdefault('AUDIT_MODE', 'sync')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.abspath(args.db) if args.db else os.path.join(workdir, 'bench.sqlite')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+        from app import create_app
+        import models
+        from benchmarks.seed import seed_organization
+
+        app = create_app()
+        with app.app_context():
+            if not args.db:
+                models.db.create_all()
+                started = time.perf_counter()
+                counts = seed_organization(models.db, models, **seed_options(args))
+                print('База: ' + ', '.join(f'{table} {count}' for table, count in counts.items())
+                      + f' ({time.perf_counter() - started:.1f} с)')
+
+        results = run(app, models.db, args.iterations, args.warmup)
+
+        with app.app_context():
+            models.db.engine.dispose()
+
+    failed = False
+    print(f"{'маршрут':<20} {'код':>4} {'p50, мс':>9} {'p95, мс':>9} {'SQL':>5} {'бюджет':>7} {'SQL 304':>8}")
+    for r in results:
+        over = r['queries'] > r['budget'] or r['status'] != 200
+        failed = failed or over
+        print(f"{r['name']:<20} {r['status']:>4} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['queries']:>5} {r['budget']:>7} {'-' if r['revalidate'] is None else r['revalidate']:>8}"
+              f"{'  ПРЕВЫШЕН' if over else ''}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Замер пропускной способности входа и влияния PBKDF2 на соседние запросы.
+
+Несколько потоков одновременно входят в систему через тестовый клиент
+Flask, а ещё один поток всё это время опрашивает лёгкий маршрут
+/projects/roles. Прогон повторяется для PASSWORD_POOL=inline (хеш в потоке
+запроса) и PASSWORD_POOL=process (ограниченный пул процессов).
+
+Запуск из каталога backend:
+    python -m benchmarks.login --threads 8 --logins 20 --method pbkdf2:sha256:200000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[max(int(round(len(sorted_values) * fraction)) - 1, 0)]
+
+
+def run_mode(threads, logins, users):
+    from datetime import datetime
+    from sqlalchemy import insert
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from passwords import hasher
+    import models
+
+    app = create_app()
+    with app.app_context():
+        models.db.create_all()
+        now = datetime.utcnow()
+        password_hash = hasher.hash('bench-password')
+        models.db.session.execute(insert(models.User), [
+            {'username': f'login{i:04d}', 'full_name': f'Login {i}', 'password_hash': password_hash,
+             'is_active': True, 'created_at': now, 'updated_at': now}
+            for i in range(users)
+        ])
+        models.db.session.commit()
+        headers = {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+
+    # Пул процессов поднимается заранее, чтобы не мерить запуск воркеров.
+    hasher.verify(password_hash, 'warmup')
+
+    login_latencies = []
+    probe_latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def login_worker(worker_id):
+        client = app.test_client()
+        for i in range(logins):
+            started = time.perf_counter()
+            response = client.post('/auth/login', json={
+                'username': f'login{(worker_id * logins + i) % users:04d}',
+                'password': 'bench-password'
+            })
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    login_latencies.append(elapsed)
+
+    def probe_worker():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/projects/roles', headers=headers)
+            probe_latencies.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    probe = threading.Thread(target=probe_worker)
+    pool = [threading.Thread(target=login_worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    probe.start()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe.join()
+    hasher.shutdown()
+
+    login_latencies.sort()
+    probe_latencies.sort()
+    return {
+        'logins_per_s': len(login_latencies) / elapsed,
+        'login_p50_ms': statistics.median(login_latencies) * 1000 if login_latencies else 0,
+        'login_p95_ms': percentile(login_latencies, 0.95) * 1000,
+        'probe_p95_ms': percentile(probe_latencies, 0.95) * 1000,
+        'rejected': statuses.get(503, 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help='одновременных входов')
+    parser.add_argument('--logins', type=int, default=10, help='входов на поток')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--method', help='PASSWORD_HASH_METHOD для замера (по умолчанию из окружения)')
+    parser.add_argument('--mode', choices=('inline', 'process'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        # Каждый режим считается в отдельном процессе: настройки пула и
+        # модули приложения читаются один раз при импорте.
+        print(json.dumps(run_mode(args.threads, args.logins, args.users)))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in ('inline', 'process'):
+            env = dict(os.environ,
+                       DATABASE_URL=f"sqlite:///{os.path.join(workdir, mode + '.sqlite')}",
+                       PASSWORD_POOL=mode,
+                       PASSWORD_POOL_MAX_PENDING=os.environ.get('PASSWORD_POOL_MAX_PENDING', str(args.threads)))
+            env.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-of-sufficient-length')
+            if args.method:
+                env['PASSWORD_HASH_METHOD'] = args.method
+            output = subprocess.run(
+                [sys.executable, '-W', 'ignore', '-m', 'benchmarks.login', '--mode', mode,
+                 '--threads', str(args.threads), '--logins', str(args.logins), '--users', str(args.users)],
+                env=env, check=True, capture_output=True, text=True
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'режим':<8} {'входов/с':>9} {'p50, мс':>9} {'p95, мс':>9} {'503':>5} {'roles p95, мс':>14}")
+    for mode, r in results.items():
+        print(f"{mode:<8} {r['logins_per_s']:>9.1f} {r['login_p50_ms']:>9.1f} {r['login_p95_ms']:>9.1f} "
+              f"{r['rejected']:>5} {r['probe_p95_ms']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Генератор синтетической организации для замеров.
+
+Заполняет пустую базу пользователями, проектами, этапами, задачами,
+зависимостями, RACI-назначениями и уведомлениями. Пользователь 1 — admin
+(пароль --password) с должностью «Администратор» и участник всех проектов.
+
+Запуск из каталога backend:
+    python -m benchmarks.seed --db /tmp/org.sqlite --users 500 --projects 40
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+
+ADMIN_POSITION = 'Администратор'
+POSITIONS = (ADMIN_POSITION, 'Руководитель проекта', 'Аналитик', 'Разработчик', 'Тестировщик')
+ROLES = ('R', 'A', 'C', 'I')
+SURNAMES = ('Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов')
+NAMES = ('Алексей', 'Мария', 'Иван', 'Анна', 'Дмитрий', 'Елена', 'Сергей', 'Ольга')
+
+
+def seed_organization(db, models, users=200, projects=20, members=30, stages=5, tasks=40,
+                      dependencies=2, raci=4, notifications=50, password='bench-password', seed=0):
+    """Заполняет базу и возвращает число созданных строк по таблицам.
+
+    members — участников на проект, stages — этапов на проект, tasks — задач
+    на этап, dependencies — не более стольких зависимостей на задачу (от
+    предыдущих задач этапа), raci — назначений на этап, notifications —
+    уведомлений на пользователя.
+    """
+    from dashboard import rebuild_task_counters
+    from notifications import rebuild_unread_counters
+    from reference import roles, positions
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    members = min(members, users)
+    raci = min(raci, members)
+
+    admin = models.User(username='admin', full_name='Admin')
+    admin.set_password(password)
+
+    db.session.execute(insert(models.Position), [
+        {'title': title, 'created_at': now} for title in POSITIONS
+    ])
+    db.session.execute(insert(models.Role), [
+        {'title': title, 'is_custom': False, 'created_at': now, 'updated_at': now} for title in ROLES
+    ])
+    db.session.execute(insert(models.User), [{
+        'username': 'admin' if i == 1 else f'user{i:06d}',
+        'full_name': 'Admin' if i == 1 else f'{rng.choice(SURNAMES)} {rng.choice(NAMES)} {i}',
+        'email': f'user{i}@example.com',
+        'password_hash': admin.password_hash,
+        'is_active': rng.random() > 0.05,
+        'created_at': now,
+        'updated_at': now
+    } for i in range(1, users + 1)])
+    db.session.execute(insert(models.UserPosition), [{'user_id': 1, 'position_id': 1, 'assigned_at': now}] + [
+        {'user_id': i, 'position_id': rng.randint(2, len(POSITIONS)), 'assigned_at': now}
+        for i in range(2, users + 1)
+    ])
+
+    db.session.execute(insert(models.Project), [{
+        'title': f'Проект {p}',
+        'description': f'Синтетический проект {p}',
+        'created_by': 1,
+        'deadline': now + timedelta(days=rng.randint(30, 365)),
+        'is_archived': rng.random() < 0.1,
+        'created_at': now,
+        'updated_at': now
+    } for p in range(1, projects + 1)])
+
+    member_rows = []
+    project_members = {}
+    for p in range(1, projects + 1):
+        chosen = [1] + rng.sample(range(2, users + 1), members - 1)
+        project_members[p] = chosen
+        member_rows.extend({'project_id': p, 'user_id': u, 'added_at': now, 'updated_at': now} for u in chosen)
+    db.session.execute(insert(models.ProjectMember), member_rows)
+
+    db.session.execute(insert(models.ProjectStage), [{
+        'project_id': p,
+        'title': f'Этап {s}',
+        'status': rng.choice(('planned', 'in_progress', 'completed')),
+        'sequence': s,
+        'dependency_policy': 'all',
+        'created_at': now,
+        'updated_at': now
+    } for p in range(1, projects + 1) for s in range(1, stages + 1)])
+
+    task_rows = []
+    dependency_rows = []
+    task_id = 0
+    for stage_id in range(1, projects * stages + 1):
+        stage_tasks = []
+        for t in range(tasks):
+            task_id += 1
+            task_rows.append({
+                'stage_id': stage_id,
+                'title': f'Задача {t}',
+                'priority': rng.choice(('low', 'medium', 'high')),
+                'is_completed': rng.random() < 0.4,
+                'deadline': now + timedelta(days=rng.randint(-30, 90)) if rng.random() < 0.7 else None,
+                'created_at': now,
+                'updated_at': now
+            })
+            for dep_id in rng.sample(stage_tasks, min(dependencies, len(stage_tasks))):
+                dependency_rows.append({'task_id': task_id, 'depends_on_task_id': dep_id})
+            stage_tasks.append(task_id)
+    _insert_chunked(db, models.Task, task_rows)
+    _insert_chunked(db, models.TaskDependency, dependency_rows)
+
+    raci_rows = []
+    for stage_id in range(1, projects * stages + 1):
+        project_id = (stage_id - 1) // stages + 1
+        for position, user_id in enumerate(rng.sample(project_members[project_id], raci)):
+            raci_rows.append({
+                'stage_id': stage_id,
+                'user_id': user_id,
+                'role_id': ROLES.index('A') + 1 if position == 0 else rng.randint(1, len(ROLES)),
+                'assigned_by': 1,
+                'assigned_at': now,
+                'created_at': now,
+                'updated_at': now
+            })
+    _insert_chunked(db, models.RACIAssignment, raci_rows)
+
+    notification_rows = [{
+        'user_id': u,
+        'message': f'Уведомление {n}',
+        'is_read': rng.random() < 0.7,
+        'related_entity': 'task',
+        'related_entity_id': rng.randint(1, task_id) if task_id else None,
+        'created_at': now - timedelta(minutes=n),
+        'updated_at': now
+    } for u in range(1, users + 1) for n in range(notifications)]
+    _insert_chunked(db, models.Notification, notification_rows)
+
+    db.session.commit()
+    rebuild_task_counters()
+    rebuild_unread_counters()
+    roles.load()
+    positions.load()
+
+    return {
+        'users': users,
+        'projects': projects,
+        'project_members': len(member_rows),
+        'stages': projects * stages,
+        'tasks': len(task_rows),
+        'dependencies': len(dependency_rows),
+        'raci_assignments': len(raci_rows),
+        'notifications': len(notification_rows)
+    }
+
+
+def _insert_chunked(db, model, rows, chunk=10000):
+    for start in range(0, len(rows), chunk):
+        db.session.execute(insert(model), rows[start:start + chunk])
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--members', type=int, default=30, help='участников на проект')
+    parser.add_argument('--stages', type=int, default=5, help='этапов на проект')
+    parser.add_argument('--tasks', type=int, default=40, help='задач на этап')
+    parser.add_argument('--dependencies', type=int, default=2, help='зависимостей на задачу')
+    parser.add_argument('--raci', type=int, default=4, help='RACI-назначений на этап')
+    parser.add_argument('--notifications', type=int, default=50, help='уведомлений на пользователя')
+    parser.add_argument('--password', default='bench-password', help='пароль всех пользователей')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора случайных чисел')
+
+
+def seed_options(args):
+    return {name: getattr(args, name) for name in (
+        'users', 'projects', 'members', 'stages', 'tasks', 'dependencies', 'raci',
+        'notifications', 'password', 'seed'
+    )}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='путь к файлу SQLite')
+    parser.add_argument('--reset', action='store_true', help='пересоздать таблицы, если база не пуста')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(args.db)}'
+    from app import create_app
+    import models
+
+    app = create_app()
+    with app.app_context():
+        if args.reset:
+            models.db.drop_all()
+        models.db.create_all()
+        if models.User.query.first() is not None:
+            parser.error('база не пуста, используйте --reset')
+        started = time.perf_counter()
+        counts = seed_organization(models.db, models, **seed_options(args))
+
+    for table, count in counts.items():
+        print(f'{table:<18} {count:>10}')
+    print(f'Готово за {time.perf_counter() - started:.1f} с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Замер выборки и сериализации большого списка задач.
+
+Сравнивает прежний путь (ORM-объекты, словари с isoformat(), jsonify) с
+выборкой только нужных колонок (serialization.fetch_rows) и кодированием
+через стандартный json и через orjson, если он установлен. Последняя строка —
+полный вызов GET /tasks/?project_id=1 через тестовый клиент.
+
+Запуск из каталога backend:
+    python -m benchmarks.serialization --rows 10000 --iterations 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def measure(function, iterations):
+    function()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        size = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='задач в проекте')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-of-sufficient-length')
+    os.environ.setdefault('OUTBOX_MODE', 'inline')
+    os.environ.setdefault('AUDIT_MODE', 'sync')
+    os.environ.setdefault('PASSWORD_POOL', 'inline')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+
+        from flask import jsonify
+        from flask_jwt_extended import create_access_token
+        from app import create_app
+        import models
+        import serialization
+        from models import db, Task, ProjectStage
+        from benchmarks.seed import seed_organization
+
+        stages = 5
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            seed_organization(db, models, users=50, projects=1, members=10, stages=stages,
+                              tasks=-(-args.rows // stages), dependencies=0, notifications=0)
+            headers = {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+
+        def orm_query():
+            return Task.query.join(ProjectStage).filter(ProjectStage.project_id == 1)
+
+        def columns_query():
+            return db.session.query(
+                Task.id, Task.title, Task.stage_id, Task.priority, Task.is_completed, Task.deadline
+            ).join(ProjectStage).filter(ProjectStage.project_id == 1)
+
+        def legacy():
+            tasks = orm_query().all()
+            response = jsonify([{
+                'id': t.id,
+                'title': t.title,
+                'stage_id': t.stage_id,
+                'priority': t.priority,
+                'is_completed': t.is_completed,
+                'deadline': t.deadline.isoformat() if t.deadline else None
+            } for t in tasks])
+            db.session.expunge_all()
+            return len(response.get_data())
+
+        def projected(dumps):
+            return lambda: len(dumps(serialization.fetch_rows(columns_query())))
+
+        variants = [('ORM + jsonify', legacy), ('колонки + json', projected(serialization.dumps_stdlib))]
+        if serialization.orjson is not None:
+            variants.append(('колонки + orjson', projected(serialization.dumps_orjson)))
+
+        print(f"{'вариант':<22} {'мс':>8} {'байт':>10}")
+        with app.test_request_context():
+            baseline = None
+            for name, function in variants:
+                elapsed, size = measure(function, args.iterations)
+                baseline = baseline or elapsed
+                print(f'{name:<22} {elapsed:>8.1f} {size:>10}  x{baseline / elapsed:.1f}')
+
+        client = app.test_client()
+        elapsed, size = measure(
+            lambda: len(client.get('/tasks/?project_id=1', headers=headers).get_data()), args.iterations
+        )
+        print(f"{'GET /tasks/ (' + ('orjson' if serialization.orjson else 'json') + ')':<22} {elapsed:>8.1f} {size:>10}")
+
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
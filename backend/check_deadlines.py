@@ -1,44 +1,112 @@
+import time
 from app import create_app
-from models import db, Task, Notification, ProjectStage, RACIAssignment, Role
+from models import db, Task, RACIAssignment, TaskDeadlineState
+from notifications import create_notifications
+from reference import roles
 from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, case, or_, and_
 
 app = create_app()
 
-def check_task_deadlines():
+CHUNK_SIZE = 1000
+DUE_SOON_DAYS = 3
+
+def _message(title, deadline, state):
+    if state == 'overdue':
+        return f"Задача '{title}' просрочена (дедлайн: {deadline.isoformat()})"
+    return f"Задача '{title}' имеет дедлайн через 3 дня ({deadline.isoformat()})"
+
+def check_task_deadlines(chunk_size=CHUNK_SIZE):
+    """Рассылает уведомления о приближающихся и просроченных дедлайнах.
+
+    Задачи выбираются порциями по возрастанию id одним запросом с
+    присоединёнными ответственными (роль A) и последним отправленным
+    состоянием. Каждый порог (3 дня, просрочка) срабатывает для задачи
+    один раз; при смене дедлайна состояние сбрасывается. Состояние
+    записывается только для задач, по которым ушло уведомление: задача без
+    ответственного будет проверена снова, когда он появится.
+    """
     with app.app_context():
+        started = time.monotonic()
         now = datetime.utcnow()
-        three_days_later = now + timedelta(days=3)
-        
-        tasks = Task.query.filter(
-            Task.deadline != None,
-            Task.is_completed == False
-        ).all()
-        
-        for task in tasks:
-            stage = ProjectStage.query.get(task.stage_id)
-            message = None
-            
-            if task.deadline < now:
-                message = f"Задача '{task.title}' просрочена (дедлайн: {task.deadline.isoformat()})"
-            elif now <= task.deadline <= three_days_later:
-                message = f"Задача '{task.title}' имеет дедлайн через 3 дня ({task.deadline.isoformat()})"
-            
-            if message:
-                accountable_users = RACIAssignment.query.filter_by(
-                    stage_id=stage.id,
-                    role_id=Role.query.filter_by(title='A').first().id
-                ).all()
-                for assignment in accountable_users:
-                    notification = Notification(
-                        user_id=assignment.user_id,
-                        message=message,
-                        related_entity='task',
-                        related_entity_id=task.id,
-                        created_at=datetime.utcnow()
-                    )
-                    db.session.add(notification)
-        
-        db.session.commit()
+        due_soon_until = now + timedelta(days=DUE_SOON_DAYS)
+        accountable_role_id = roles.id_for('A')
+        if accountable_role_id is None:
+            print("Проверка дедлайнов пропущена: роль A не найдена")
+            return {'tasks_processed': 0, 'notifications_sent': 0, 'elapsed': 0.0}
+
+        state = case((Task.deadline < now, 'overdue'), else_='due_soon')
+        pending = (
+            select(Task.id, Task.title, Task.deadline, Task.stage_id, state.label('state'))
+            .outerjoin(TaskDeadlineState, TaskDeadlineState.task_id == Task.id)
+            .where(
+                Task.is_completed == False,
+                Task.deadline != None,
+                Task.deadline <= due_soon_until,
+                or_(
+                    TaskDeadlineState.task_id == None,
+                    TaskDeadlineState.deadline != Task.deadline,
+                    TaskDeadlineState.state != state
+                )
+            )
+            .order_by(Task.id)
+        )
+
+        tasks_processed = 0
+        notifications_sent = 0
+        last_id = 0
+
+        while True:
+            chunk = pending.where(Task.id > last_id).limit(chunk_size).subquery()
+            rows = db.session.execute(
+                select(chunk, RACIAssignment.user_id)
+                .outerjoin(RACIAssignment, and_(
+                    RACIAssignment.stage_id == chunk.c.stage_id,
+                    RACIAssignment.role_id == accountable_role_id
+                ))
+                .order_by(chunk.c.id)
+            ).all()
+            if not rows:
+                break
+
+            states = {}
+            notifications = []
+            for row in rows:
+                if row.user_id is not None:
+                    states[row.id] = {
+                        'task_id': row.id,
+                        'state': row.state,
+                        'deadline': row.deadline,
+                        'notified_at': now
+                    }
+                    notifications.append({
+                        'user_id': row.user_id,
+                        'message': _message(row.title, row.deadline, row.state),
+                        'related_entity': 'task',
+                        'related_entity_id': row.id,
+                        'created_at': now
+                    })
+
+            if notifications:
+                create_notifications(notifications)
+                db.session.execute(
+                    delete(TaskDeadlineState).where(TaskDeadlineState.task_id.in_(list(states)))
+                )
+                db.session.execute(insert(TaskDeadlineState), list(states.values()))
+                db.session.commit()
+
+            tasks_processed += len({row.id for row in rows})
+            notifications_sent += len(notifications)
+            last_id = rows[-1].id
+
+        elapsed = time.monotonic() - started
+        print(f"Проверка дедлайнов: задач обработано {tasks_processed}, "
+              f"уведомлений отправлено {notifications_sent}, время {elapsed:.2f} с")
+        return {
+            'tasks_processed': tasks_processed,
+            'notifications_sent': notifications_sent,
+            'elapsed': elapsed
+        }
 
 if __name__ == '__main__':
-    check_task_deadlines()
\ No newline at end of file
+    check_task_deadlines()
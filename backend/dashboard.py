@@ -0,0 +1,126 @@
+from models import db, Project, ProjectMember, ProjectStage, Task, StageTaskCounter
+from notifications import unread_count
+from datetime import datetime
+from sqlalchemy import select, update, delete, insert, and_, case, literal
+from sqlalchemy.sql import func
+
+
+def adjust_task_counters(stage_id, total=0, completed=0):
+    """Сдвигает счётчики задач этапа на заданные величины.
+
+    Вызывается после того, как изменение задачи добавлено в сессию. Если строки
+    счётчика ещё нет (этап создан до появления таблицы), она пересчитывается
+    по таблице задач.
+    """
+    if not total and not completed:
+        return
+
+    result = db.session.execute(
+        update(StageTaskCounter)
+        .where(StageTaskCounter.stage_id == stage_id)
+        .values(
+            total_tasks=StageTaskCounter.total_tasks + total,
+            completed_tasks=StageTaskCounter.completed_tasks + completed,
+            updated_at=datetime.utcnow()
+        )
+    )
+    if result.rowcount == 0:
+        db.session.flush()
+        db.session.execute(
+            insert(StageTaskCounter).from_select(
+                ['stage_id', 'project_id', 'total_tasks', 'completed_tasks', 'updated_at'],
+                _stage_counts_query().where(ProjectStage.id == stage_id)
+            )
+        )
+
+
+def rebuild_task_counters():
+    """Полностью пересчитывает счётчики задач всех этапов одним запросом."""
+    db.session.execute(delete(StageTaskCounter))
+    db.session.execute(
+        insert(StageTaskCounter).from_select(
+            ['stage_id', 'project_id', 'total_tasks', 'completed_tasks', 'updated_at'],
+            _stage_counts_query()
+        )
+    )
+    db.session.commit()
+
+
+def _stage_counts_query():
+    return (
+        select(
+            ProjectStage.id,
+            ProjectStage.project_id,
+            func.count(Task.id),
+            func.coalesce(func.sum(case((Task.is_completed == True, 1), else_=0)), 0),
+            literal(datetime.utcnow(), db.DateTime)
+        )
+        .select_from(ProjectStage)
+        .outerjoin(Task, Task.stage_id == ProjectStage.id)
+        .group_by(ProjectStage.id, ProjectStage.project_id)
+    )
+
+
+def get_dashboard_data(user_id):
+    """Собирает данные дашборда пользователя.
+
+    Итоги по задачам всех проектов пользователя берутся одним сгруппированным
+    запросом по счётчикам этапов, число просроченных задач считается
+    коррелированным подзапросом по индексу idx_task_stage_open, число
+    непрочитанных уведомлений — из счётчика пользователя.
+    """
+    now = datetime.utcnow()
+
+    overdue = (
+        select(func.count(Task.id))
+        .join(ProjectStage, Task.stage_id == ProjectStage.id)
+        .where(
+            ProjectStage.project_id == Project.id,
+            Task.is_completed == False,
+            Task.deadline < now
+        )
+        .correlate(Project)
+        .scalar_subquery()
+    )
+
+    rows = db.session.execute(
+        select(
+            Project.id,
+            Project.title,
+            Project.is_archived,
+            func.coalesce(func.sum(StageTaskCounter.total_tasks), 0),
+            func.coalesce(func.sum(StageTaskCounter.completed_tasks), 0),
+            overdue
+        )
+        .join(ProjectMember, and_(
+            ProjectMember.project_id == Project.id,
+            ProjectMember.user_id == user_id
+        ))
+        .outerjoin(StageTaskCounter, StageTaskCounter.project_id == Project.id)
+        .group_by(Project.id, Project.title, Project.is_archived)
+        .order_by(Project.id)
+    ).all()
+
+    unread = unread_count(user_id)
+
+    dashboard_data = {
+        'projects': [],
+        'unread_notifications': unread,
+        'total_incomplete_tasks': 0,
+        'total_overdue_tasks': 0
+    }
+
+    for project_id, title, is_archived, total_tasks, completed_tasks, overdue_tasks in rows:
+        dashboard_data['projects'].append({
+            'id': project_id,
+            'title': title,
+            'total_tasks': total_tasks,
+            'completed_tasks': completed_tasks,
+            'overdue_tasks': overdue_tasks,
+            'progress': (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0,
+            'is_archived': is_archived
+        })
+        dashboard_data['total_incomplete_tasks'] += total_tasks - completed_tasks
+        dashboard_data['total_overdue_tasks'] += overdue_tasks
+
+    return dashboard_data
@@ -0,0 +1,138 @@
+import os
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from models import db
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def database_config():
+    """Настройки подключения к базе из переменных окружения."""
+    return {
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL', 'sqlite:///db.sqlite'),
+        'DB_POOL_SIZE': _env_int('DB_POOL_SIZE', 5),
+        'DB_MAX_OVERFLOW': _env_int('DB_MAX_OVERFLOW', 10),
+        'DB_POOL_TIMEOUT': _env_int('DB_POOL_TIMEOUT', 30),
+        'DB_POOL_RECYCLE': _env_int('DB_POOL_RECYCLE', 1800),
+        'DB_STATEMENT_TIMEOUT_MS': _env_int('DB_STATEMENT_TIMEOUT_MS', 30000),
+        'SQLITE_TUNING': os.getenv('SQLITE_TUNING', '1') not in ('0', 'false', 'no'),
+        'SQLITE_BUSY_TIMEOUT_MS': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'SQLITE_MMAP_SIZE': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'SQLITE_CACHE_SIZE_KB': _env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024),
+    }
+
+
+def engine_options(config):
+    """Параметры create_engine для SQLALCHEMY_ENGINE_OPTIONS."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    timeout_ms = config['DB_STATEMENT_TIMEOUT_MS']
+
+    if backend == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return {}
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000},
+        }
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+    if timeout_ms:
+        if backend == 'postgresql':
+            options['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+        elif backend in ('mysql', 'mariadb'):
+            options['connect_args'] = {'init_command': f'SET SESSION max_execution_time={timeout_ms}'}
+    return options
+
+
+def bulk_returning_supported(session):
+    """Умеет ли база пакетный INSERT ... RETURNING с id в порядке строк.
+
+    SQLite и PostgreSQL умеют; на MySQL и MariaDB строки вставляются через
+    ORM, который получает id каждой строки отдельно.
+    """
+    return session.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order
+
+
+def init_database(app):
+    """Подключает SQLAlchemy к приложению и настраивает соединения SQLite."""
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    db.init_app(app)
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite':
+            _configure_sqlite(engine, app.config)
+
+
+def _configure_sqlite(engine, config):
+    """Включает WAL и прочие PRAGMA на каждом новом соединении SQLite.
+
+    Ограничение времени выполнения запроса в SQLite реализовано через
+    progress handler: он прерывает оператор, вышедший за DB_STATEMENT_TIMEOUT_MS.
+    Срок отсчитывается от начала оператора и покрывает и выборку строк
+    результата; он снимается следующим оператором, коммитом, откатом или
+    возвратом соединения в пул.
+    """
+    tuning = config['SQLITE_TUNING']
+    timeout_ms = config['DB_STATEMENT_TIMEOUT_MS']
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if tuning:
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+            cursor.execute(f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}")
+            cursor.execute(f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}")
+        cursor.close()
+
+        if timeout_ms:
+            state = {'deadline': None}
+            connection_record.info['statement_state'] = state
+            dbapi_connection.set_progress_handler(
+                lambda: 1 if state['deadline'] and time.monotonic() > state['deadline'] else 0,
+                10000
+            )
+
+    if timeout_ms:
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+            state = conn.info.get('statement_state')
+            if state is not None:
+                state['deadline'] = time.monotonic() + timeout_ms / 1000
+
+        def stop_statement_timer(info):
+            state = info.get('statement_state')
+            if state is not None:
+                state['deadline'] = None
+
+        @event.listens_for(engine, 'commit')
+        def stop_timer_on_commit(conn):
+            stop_statement_timer(conn.info)
+
+        @event.listens_for(engine, 'rollback')
+        def stop_timer_on_rollback(conn):
+            stop_statement_timer(conn.info)
+
+        @event.listens_for(engine, 'checkin')
+        def stop_timer_on_checkin(dbapi_connection, connection_record):
+            stop_statement_timer(connection_record.info)
+
+        @event.listens_for(engine, 'handle_error')
+        def reset_statement_timer(context):
+            if context.connection is not None:
+                stop_statement_timer(context.connection.info)
@@ -0,0 +1,155 @@
+from collections import deque
+import heapq
+from sqlalchemy import insert
+from models import db, Task, TaskDependency
+from cache import TTLCache, MISSING
+from session_hooks import after_transaction
+
+_graphs = TTLCache(maxsize=1000, ttl=300)
+
+# Политики неявных зависимостей новой задачи этапа:
+# none — без зависимостей, chain — только от предыдущей незавершённой задачи,
+# all — от всех предыдущих незавершённых задач (прежнее поведение).
+DEPENDENCY_POLICIES = ('none', 'chain', 'all')
+
+
+class StageDependencyGraph:
+    """Граф зависимостей задач одного этапа в виде списков смежности.
+
+    depends_on[t] — задачи, от которых зависит t; dependents[t] — задачи,
+    которые зависят от t.
+    """
+
+    def __init__(self, stage_id, task_ids, edges):
+        self.stage_id = stage_id
+        self.task_ids = sorted(task_ids)
+        self.depends_on = {task_id: set() for task_id in self.task_ids}
+        self.dependents = {task_id: set() for task_id in self.task_ids}
+        for task_id, depends_on_task_id in edges:
+            self.depends_on.setdefault(task_id, set()).add(depends_on_task_id)
+            self.dependents.setdefault(depends_on_task_id, set()).add(task_id)
+
+    @classmethod
+    def load(cls, stage_id):
+        """Загружает задачи этапа и их зависимости одним запросом."""
+        rows = db.session.query(Task.id, TaskDependency.depends_on_task_id).outerjoin(
+            TaskDependency, TaskDependency.task_id == Task.id
+        ).filter(Task.stage_id == stage_id).all()
+
+        task_ids = {task_id for task_id, _ in rows}
+        edges = [(task_id, dep_id) for task_id, dep_id in rows if dep_id in task_ids]
+        return cls(stage_id, task_ids, edges)
+
+    def find_cycle(self, task_id, new_dependencies):
+        """Проверяет замену зависимостей задачи на new_dependencies.
+
+        Возвращает первую зависимость, которая замкнула бы цикл, или None.
+        Цикл возникает, только если новая зависимость уже (транзитивно)
+        зависит от task_id, поэтому достаточно одного обхода назад от task_id.
+        """
+        reachable = {task_id}
+        queue = deque([task_id])
+        while queue:
+            current = queue.popleft()
+            for dependent in self.dependents.get(current, ()):
+                if dependent not in reachable:
+                    reachable.add(dependent)
+                    queue.append(dependent)
+
+        for dep_id in new_dependencies:
+            if dep_id in reachable:
+                return dep_id
+        return None
+
+    def topological_order(self):
+        """Возвращает (порядок, задачи в циклах) алгоритмом Кана.
+
+        При равенстве первой идёт задача с меньшим id, поэтому порядок
+        устойчив между вызовами.
+        """
+        in_degree = {
+            task_id: sum(1 for dep_id in self.depends_on.get(task_id, ()) if dep_id in self.depends_on)
+            for task_id in self.task_ids
+        }
+        heap = [task_id for task_id, degree in in_degree.items() if degree == 0]
+        heapq.heapify(heap)
+
+        order = []
+        while heap:
+            current = heapq.heappop(heap)
+            order.append(current)
+            for dependent in self.dependents.get(current, ()):
+                if dependent not in in_degree:
+                    continue
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    heapq.heappush(heap, dependent)
+
+        ordered = set(order)
+        cyclic = [task_id for task_id in self.task_ids if task_id not in ordered]
+        return order, cyclic
+
+
+    def redundant_edges(self):
+        """Рёбра, которые удаляет транзитивное сокращение графа.
+
+        Ребро u -> v лишнее, если v достижима из u через другую прямую
+        зависимость. Замыкания считаются битовыми масками в топологическом
+        порядке; задачи, входящие в циклы, не трогаются.
+        """
+        order, _ = self.topological_order()
+        bit = {task_id: 1 << index for index, task_id in enumerate(order)}
+        closure = {}
+        redundant = []
+        for task_id in order:
+            deps = [dep_id for dep_id in self.depends_on.get(task_id, ()) if dep_id in bit]
+            indirect = 0
+            reach = 0
+            for dep_id in deps:
+                indirect |= closure[dep_id]
+                reach |= closure[dep_id] | bit[dep_id]
+            closure[task_id] = reach
+            redundant.extend((task_id, dep_id) for dep_id in deps if indirect & bit[dep_id])
+        return redundant
+
+
+def implicit_dependency_ids(stage_id, policy, task_id):
+    """Id задач этапа, от которых по политике этапа зависит новая задача task_id."""
+    if policy == 'none':
+        return []
+    query = db.session.query(Task.id).filter(
+        Task.stage_id == stage_id,
+        Task.id < task_id,
+        Task.is_completed == False
+    ).order_by(Task.id.desc())
+    if policy == 'chain':
+        query = query.limit(1)
+    return [dep_id for dep_id, in query]
+
+
+def insert_dependencies(pairs):
+    """Записывает рёбра (task_id, depends_on_task_id) одним пакетным INSERT."""
+    if pairs:
+        db.session.execute(insert(TaskDependency), [
+            {'task_id': task_id, 'depends_on_task_id': dep_id}
+            for task_id, dep_id in pairs
+        ])
+
+
+def get_stage_graph(stage_id, fresh=False):
+    """Возвращает граф зависимостей этапа из кэша процесса или из базы.
+
+    fresh=True перечитывает граф из базы: так делают проверки перед записью,
+    чтобы не пропустить цикл из-за изменений в другом процессе.
+    """
+    graph = MISSING if fresh else _graphs.get(stage_id)
+    if graph is MISSING:
+        graph = StageDependencyGraph.load(stage_id)
+        _graphs.set(stage_id, graph)
+    return graph
+
+
+def invalidate_stage_graph(stage_id):
+    """Сбрасывает закэшированный граф этапа сейчас и после конца транзакции."""
+    _graphs.pop(stage_id)
+    after_transaction(lambda: _graphs.pop(stage_id))
@@ -0,0 +1,32 @@
+from flask import request, make_response
+from datetime import datetime
+from serialization import json_response
+
+
+def conditional_json(etag, build):
+    """Отвечает 304, если клиент прислал актуальный ETag, иначе JSON из build().
+
+    build вызывается только при несовпадении ETag, поэтому на 304 данные не
+    загружаются и не сериализуются.
+    """
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = json_response(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def scope_etag(name, scope):
+    """ETag области данных по строке одной агрегатной выборки.
+
+    scope — строка вида (count(...), max(updated_at), ...):
+    вставка или удаление строки меняет счётчик, а любое изменение строки
+    поднимает max(updated_at). Поэтому записи в области должны обновлять
+    updated_at (ORM делает это через onupdate, массовые UPDATE — явно).
+    """
+    return '-'.join([name] + [
+        value.strftime('%Y%m%d%H%M%S%f') if isinstance(value, datetime) else str(value or 0)
+        for value in scope
+    ])
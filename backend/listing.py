@@ -0,0 +1,105 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class InvalidListingParams(ValueError):
+    pass
+
+
+def is_paginated():
+    """Просит ли клиент постраничную выдачу (передан limit или cursor).
+
+    Без них списки отдаются целиком, как раньше: старые клиенты не читают
+    X-Next-Cursor и иначе молча теряли бы всё после первой страницы.
+    """
+    return 'limit' in request.args or 'cursor' in request.args
+
+
+def parse_limit(default=50, maximum=200):
+    """Читает параметр limit из строки запроса и ограничивает его сверху."""
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        raise InvalidListingParams('limit должен быть целым числом')
+    if limit < 1:
+        raise InvalidListingParams('limit должен быть положительным')
+    return min(limit, maximum)
+
+
+def parse_bool(name):
+    """Читает логический флаг из строки запроса (1/true/yes)."""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def parse_datetime(name):
+    """Читает дату-время в формате ISO 8601 из строки запроса."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidListingParams(f'{name} должен быть датой в формате ISO 8601')
+
+
+def encode_cursor(*values):
+    """Упаковывает значения ключа последней строки страницы в непрозрачный курсор."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(*types):
+    """Распаковывает курсор из параметра cursor; types задаёт типы значений ключа.
+
+    Возвращает None, если курсор не передан.
+    """
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(types):
+            raise ValueError
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for t, v in zip(types, values)
+        )
+    except (ValueError, TypeError):
+        raise InvalidListingParams('Некорректный курсор')
+
+
+def paginate(rows, limit, key):
+    """Отрезает лишнюю строку выборки limit + 1 и строит курсор следующей страницы.
+
+    limit = None означает выдачу без страниц.
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def with_next_cursor(response, next_cursor):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+
+def prefix_range(column, prefix):
+    """Условие «column начинается с prefix» в виде диапазона.
+
+    В отличие от LIKE диапазон использует обычный B-tree индекс по колонке
+    (в SQLite LIKE регистронезависим и индекс с BINARY-сравнением не берёт).
+    Для поиска без учёта регистра передавайте колонку и префикс в нижнем
+    регистре.
+    """
+    return (column >= prefix) & (column < prefix + '\U0010ffff')
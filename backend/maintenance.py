@@ -0,0 +1,86 @@
+import argparse
+from datetime import datetime, timedelta
+from app import create_app
+from dashboard import rebuild_task_counters
+from notifications import rebuild_unread_counters
+from dependency_graph import StageDependencyGraph
+from stage_order import renormalize
+from models import db, Task, TaskDependency, NotificationOutbox, ProjectStage
+from sqlalchemy import delete, select, or_, tuple_
+
+app = create_app()
+
+def rebuild_counters():
+    with app.app_context():
+        rebuild_task_counters()
+        print("Счётчики задач пересчитаны")
+
+def reconcile_unread():
+    with app.app_context():
+        rebuild_unread_counters()
+        print("Счётчики непрочитанных уведомлений пересчитаны")
+
+def reduce_dependencies():
+    """Удаляет висячие и транзитивно избыточные зависимости задач."""
+    with app.app_context():
+        existing_tasks = select(Task.id)
+        dangling = db.session.execute(
+            delete(TaskDependency).where(or_(
+                TaskDependency.task_id.not_in(existing_tasks),
+                TaskDependency.depends_on_task_id.not_in(existing_tasks)
+            ))
+        ).rowcount
+        db.session.commit()
+
+        stage_ids = [stage_id for stage_id, in db.session.query(Task.stage_id).join(
+            TaskDependency, TaskDependency.task_id == Task.id
+        ).distinct()]
+
+        removed = 0
+        for stage_id in stage_ids:
+            redundant = StageDependencyGraph.load(stage_id).redundant_edges()
+            if redundant:
+                db.session.execute(
+                    delete(TaskDependency).where(
+                        tuple_(TaskDependency.task_id, TaskDependency.depends_on_task_id).in_(redundant)
+                    )
+                )
+                db.session.commit()
+                removed += len(redundant)
+
+        print(f"Удалено висячих зависимостей: {dangling}, избыточных: {removed}, этапов: {len(stage_ids)}")
+
+def purge_outbox(days=7):
+    """Удаляет из outbox события, разосланные раньше чем days дней назад."""
+    with app.app_context():
+        removed = db.session.execute(
+            delete(NotificationOutbox).where(
+                NotificationOutbox.processed_at < datetime.utcnow() - timedelta(days=days)
+            )
+        ).rowcount
+        db.session.commit()
+        print(f"Удалено событий outbox: {removed}")
+
+def renormalize_stage_order():
+    """Возвращает ключам порядка этапов равный шаг, не меняя сам порядок."""
+    with app.app_context():
+        project_ids = [project_id for project_id, in db.session.query(ProjectStage.project_id).distinct()]
+        updated = 0
+        for project_id in project_ids:
+            updated += renormalize(project_id)
+            db.session.commit()
+        print(f"Перенумеровано этапов: {updated}, проектов: {len(project_ids)}")
+
+COMMANDS = {
+    'rebuild-task-counters': rebuild_counters,
+    'reduce-dependencies': reduce_dependencies,
+    'reconcile-unread': reconcile_unread,
+    'purge-outbox': purge_outbox,
+    'renormalize-stage-order': renormalize_stage_order,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Служебные операции над базой данных')
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    COMMANDS[args.command]()
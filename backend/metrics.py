@@ -0,0 +1,226 @@
+import bisect
+import hmac
+import threading
+import time
+from flask import Response, g, has_request_context, request, jsonify
+from sqlalchemy import event
+from models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+SLOW_STATEMENTS_LOGGED = 10
+MAX_STATEMENTS_KEPT = 1000
+
+
+def _label_string(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_label_string(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    labels = _label_string(self.labels + ('le',), label_values + (bound,))
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _label_string(self.labels, label_values)
+                lines.append(f'{self.name}_sum{labels} {total}')
+                lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Gauge:
+    """Значение, которое считывается функцией в момент выгрузки метрик.
+
+    kind='counter' — для монотонно растущих значений, которые модуль
+    считает сам.
+    """
+
+    def __init__(self, name, help_text, callback, kind='gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.kind = kind
+
+    def render(self):
+        return [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} {self.kind}',
+            f'{self.name} {self.callback()}'
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    'http_requests_total', 'Обработанные HTTP-запросы', ('endpoint', 'method', 'status')
+))
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса', LATENCY_BUCKETS, ('endpoint', 'method')
+))
+request_sql_statements = registry.register(Histogram(
+    'http_request_sql_statements', 'Число SQL-запросов на HTTP-запрос', SQL_COUNT_BUCKETS, ('endpoint',)
+))
+request_sql_duration = registry.register(Histogram(
+    'http_request_sql_duration_seconds', 'Суммарное время SQL-запросов на HTTP-запрос', LATENCY_BUCKETS, ('endpoint',)
+))
+response_size = registry.register(Histogram(
+    'http_response_size_bytes', 'Размер тела ответа', SIZE_BUCKETS, ('endpoint',)
+))
+
+
+def register_gauge(name, help_text, callback, kind='gauge'):
+    """Добавляет в /metrics значение, вычисляемое при каждой выгрузке."""
+    return registry.register(Gauge(name, help_text, callback, kind))
+
+
+def _start_request():
+    # Стек: вложенные запросы пакета (/batch) делят flask.g с внешним запросом.
+    g.setdefault('_metrics', []).append(
+        {'started': time.perf_counter(), 'sql_count': 0, 'sql_time': 0.0, 'statements': []}
+    )
+
+
+def _finish_request(app, response):
+    stack = g.get('_metrics')
+    if not stack:
+        return response
+    stats = stack.pop()
+    duration = time.perf_counter() - stats['started']
+    endpoint = request.endpoint or 'unmatched'
+
+    requests_total.inc(endpoint, request.method, response.status_code)
+    request_duration.observe(duration, endpoint, request.method)
+    request_sql_statements.observe(stats['sql_count'], endpoint)
+    request_sql_duration.observe(stats['sql_time'], endpoint)
+    # Потоковый ответ (SSE, выгрузки) нельзя измерить, не прочитав его целиком.
+    size = None if response.is_streamed else response.calculate_content_length()
+    if size is not None:
+        response_size.observe(size, endpoint)
+
+    app.logger.debug('%s %s %s %.1f мс, SQL: %d', request.method, request.path,
+                     response.status_code, duration * 1000, stats['sql_count'])
+    if duration * 1000 >= app.config['SLOW_REQUEST_MS']:
+        slowest = sorted(stats['statements'], reverse=True)[:SLOW_STATEMENTS_LOGGED]
+        app.logger.warning(
+            'Медленный запрос %s %s: %.1f мс, SQL: %d за %.1f мс\n%s',
+            request.method, request.path, duration * 1000, stats['sql_count'], stats['sql_time'] * 1000,
+            '\n'.join(f'  {elapsed * 1000:.1f} мс: {statement}' for elapsed, statement in slowest)
+        )
+    return response
+
+
+def _instrument_engine(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        if not has_request_context():
+            return
+        stack = g.get('_metrics')
+        if stack:
+            stats = stack[-1]
+            elapsed = time.perf_counter() - started
+            stats['sql_count'] += 1
+            stats['sql_time'] += elapsed
+            if len(stats['statements']) < MAX_STATEMENTS_KEPT:
+                stats['statements'].append((elapsed, ' '.join(statement.split())[:500]))
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_query_timer(context):
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
+
+
+def init_metrics(app):
+    """Подключает сбор метрик запросов и SQL и регистрирует /metrics.
+
+    /metrics раскрывает трафик по маршрутам и время SQL, поэтому маршрут
+    появляется только при заданном METRICS_TOKEN и отвечает лишь на запросы
+    с заголовком Authorization: Bearer <METRICS_TOKEN>.
+    """
+    with app.app_context():
+        _instrument_engine(db.engine)
+
+    app.before_request(_start_request)
+    app.after_request(lambda response: _finish_request(app, response))
+
+    token = app.config['METRICS_TOKEN']
+    if not token:
+        return
+
+    @app.route('/metrics')
+    def metrics():
+        """Метрики процесса в текстовом формате Prometheus."""
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({"error": "Требуется токен метрик"}), 401
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
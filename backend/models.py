@@ -1,5 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hasher
 from datetime import datetime
 from sqlalchemy import Index, Enum, ForeignKeyConstraint
 from sqlalchemy.orm import relationship, validates
@@ -10,6 +10,19 @@ StageStatus = Enum('planned', 'in_progress', 'completed', name='stage_status')
 TaskPriority = Enum('low', 'medium', 'high', name='task_priority')
 RACIRole = Enum('R', 'A', 'C', 'I', name='raci_role')
 NotificationEntity = Enum('project', 'stage', 'task', name='notification_entity')
+DeadlineState = Enum('due_soon', 'overdue', name='deadline_state')
+DependencyPolicy = Enum('none', 'chain', 'all', name='dependency_policy')
+
+def _lowercase_of(source):
+    """Значение по умолчанию для поисковой колонки: source в нижнем регистре.
+
+    Нужно для вставок в обход ORM; lower() в Python, в отличие от lower()
+    SQLite, понимает и кириллицу.
+    """
+    def default(context):
+        value = context.get_current_parameters().get(source)
+        return value.lower() if value else value
+    return default
 
 class User(db.Model):
     __tablename__ = 'user'
@@ -21,24 +34,38 @@ class User(db.Model):
     phone = db.Column(db.String(30))
     email = db.Column(db.String(100), unique=True, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
+    # Имя и ФИО в нижнем регистре для регистронезависимого поиска по префиксу
+    username_search = db.Column(db.String(100), default=_lowercase_of('username'))
+    full_name_search = db.Column(db.String(100), default=_lowercase_of('full_name'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     __table_args__ = (
         Index('idx_user_username', 'username'),
+        Index('idx_user_username_search', 'username_search'),
+        Index('idx_user_full_name_search', 'full_name_search'),
     )
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password_hash = hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return hasher.needs_rehash(self.password_hash)
     
     @validates('username')
     def validate_username(self, key, username):
         if not username or len(username) < 3:
             raise ValueError('Имя пользователя должно быть длиннее 3 символов')
+        self.username_search = username.lower()
         return username
+
+    @validates('full_name')
+    def validate_full_name(self, key, full_name):
+        self.full_name_search = full_name.lower() if full_name else full_name
+        return full_name
     
     @validates('phone')
     def validate_phone(self, key, phone):
@@ -83,6 +110,13 @@ class User(db.Model):
         cascade='all, delete-orphan'
     )
     
+    notification_counter = relationship(
+        'UserNotificationCounter',
+        uselist=False,
+        lazy=True,
+        cascade='all, delete-orphan'
+    )
+    
     audit_logs = relationship(
         'AuditLog', 
         backref='user', 
@@ -167,10 +201,17 @@ class ProjectStage(db.Model):
     status = db.Column(StageStatus, default='planned')
     deadline = db.Column(db.DateTime)
     sequence = db.Column(db.Integer, nullable=False)
+    dependency_policy = db.Column(DependencyPolicy, default='all')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     tasks = relationship('Task', backref='stage', lazy=True, cascade='all, delete-orphan')
+    task_counter = relationship(
+        'StageTaskCounter',
+        uselist=False,
+        lazy=True,
+        cascade='all, delete-orphan'
+    )
     raci_assignments = relationship(
         'RACIAssignment', 
         backref='stage_assignments', 
@@ -197,8 +238,40 @@ class Task(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    deadline_state = relationship(
+        'TaskDeadlineState',
+        uselist=False,
+        lazy=True,
+        cascade='all, delete-orphan'
+    )
+    
     __table_args__ = (
         Index('idx_task_stage', 'stage_id'),
+        Index('idx_task_stage_open', 'stage_id', 'is_completed', 'deadline'),
+        Index('idx_task_open_deadline', 'is_completed', 'deadline'),
+    )
+
+class TaskDeadlineState(db.Model):
+    """Последнее состояние дедлайна задачи, о котором уже отправлены уведомления"""
+    __tablename__ = 'task_deadline_state'
+    
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), primary_key=True)
+    state = db.Column(DeadlineState, nullable=False)
+    deadline = db.Column(db.DateTime, nullable=False)
+    notified_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StageTaskCounter(db.Model):
+    """Счётчики задач этапа для дашборда"""
+    __tablename__ = 'stage_task_counter'
+    
+    stage_id = db.Column(db.Integer, db.ForeignKey('project_stage.id'), primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    total_tasks = db.Column(db.Integer, nullable=False, default=0)
+    completed_tasks = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_counter_project', 'project_id'),
     )
 
 class ProjectMember(db.Model):
@@ -274,6 +347,30 @@ class Notification(db.Model):
     
     __table_args__ = (
         Index('idx_notification_user', 'user_id', 'is_read'),
+        Index('idx_notification_feed', 'user_id', 'created_at', 'id'),
+    )
+
+class UserNotificationCounter(db.Model):
+    """Число непрочитанных уведомлений пользователя"""
+    __tablename__ = 'user_notification_counter'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class NotificationOutbox(db.Model):
+    """Очередь событий для фоновой рассылки уведомлений"""
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        Index('idx_outbox_pending', 'processed_at', 'id'),
     )
 
 class AuditLog(db.Model):
@@ -291,9 +388,10 @@ class AuditLog(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     __table_args__ = (
-        Index('idx_audit_entity', 'entity_type', 'entity_id'),
-        Index('idx_audit_user', 'user_id'),
-        Index('idx_audit_timestamp', 'timestamp'),
+        Index('idx_audit_entity_time', 'entity_type', 'entity_id', 'timestamp', 'id'),
+        Index('idx_audit_user_time', 'user_id', 'timestamp', 'id'),
+        Index('idx_audit_action', 'action', 'timestamp', 'id'),
+        Index('idx_audit_time', 'timestamp', 'id'),
     )
     
 class TaskDependency(db.Model):
@@ -0,0 +1,133 @@
+import json
+import queue
+import threading
+from collections import defaultdict, deque
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+STREAM_TICKET_SALT = 'notification-stream'
+
+
+class Subscription:
+    """Очередь новых уведомлений одного подключения к потоку."""
+
+    def __init__(self, user_id, maxsize=1000):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        # Выставляется, если очередь переполнилась и события потеряны:
+        # подключение должно дочитать пропущенное из базы.
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RecentIds:
+    """Ограниченное множество последних отправленных id уведомлений.
+
+    id выдаются при вставке, а видны после коммита, поэтому при нескольких
+    пишущих транзакциях меньший id может появиться позже большего; поток
+    отсекает повторы по этому множеству, а не сравнением с последним id.
+    """
+
+    def __init__(self, maxlen=1000):
+        self._order = deque()
+        self._ids = set()
+        self._maxlen = maxlen
+
+    def add(self, notification_id):
+        """Запоминает id; возвращает False, если он уже был отправлен."""
+        if notification_id in self._ids:
+            return False
+        self._ids.add(notification_id)
+        self._order.append(notification_id)
+        if len(self._order) > self._maxlen:
+            self._ids.discard(self._order.popleft())
+        return True
+
+    def __iter__(self):
+        return iter(self._order)
+
+
+class NotificationHub:
+    """Рассылка новых уведомлений подключённым в этом процессе клиентам.
+
+    Уведомления, созданные в других процессах (worker outbox,
+    check_deadlines, другие экземпляры приложения), сюда не попадают —
+    их подключения дочитывают из базы при периодическом опросе.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, events):
+        """Раздаёт события — пары (user_id, данные) — подписчикам получателей."""
+        with self._lock:
+            targets = [
+                (event, list(self._subscribers.get(user_id, ())))
+                for user_id, event in events
+            ]
+        for event, subscribers in targets:
+            for subscription in subscribers:
+                subscription.put(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+hub = NotificationHub()
+
+
+def _ticket_serializer():
+    return URLSafeTimedSerializer(current_app.config['JWT_SECRET_KEY'], salt=STREAM_TICKET_SALT)
+
+
+def issue_stream_ticket(user_id):
+    """Билет на подключение к потоку: подписанный id пользователя."""
+    return _ticket_serializer().dumps(user_id)
+
+
+def read_stream_ticket(ticket):
+    """id пользователя из действующего билета или None."""
+    if not ticket:
+        return None
+    try:
+        return int(_ticket_serializer().loads(ticket, max_age=current_app.config['NOTIFICATION_STREAM_TICKET_TTL']))
+    except (BadSignature, TypeError, ValueError):
+        return None
+
+
+def format_event(data, event=None, event_id=None):
+    """Кадр server-sent events."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
@@ -1,25 +1,303 @@
-from flask import Blueprint, request, jsonify
+import time
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Notification, db
-from datetime import datetime
+from models import Notification, UserNotificationCounter, User, db
+from datetime import datetime, timedelta
+from collections import Counter, defaultdict
+from sqlalchemy import select, update, delete, insert, tuple_
+from sqlalchemy.sql import func, literal
+from session_hooks import after_commit
+from database import bulk_returning_supported
+from notification_stream import hub, format_event, RecentIds, issue_stream_ticket, read_stream_ticket
+from http_cache import conditional_json
+from listing import is_paginated, parse_limit, parse_bool, decode_cursor, paginate, with_next_cursor, InvalidListingParams
 
 notifications_bp = Blueprint('notifications', __name__)
 
-@notifications_bp.route('/notifications', methods=['GET'])
-@jwt_required()
-def get_notifications():
-    """Получение списка уведомлений текущего пользователя (доступно любому авторизованному пользователю)."""
-    current_user_id = int(get_jwt_identity())
-    notifications = Notification.query.filter_by(user_id=current_user_id).order_by(Notification.created_at.desc()).all()
-    
-    return jsonify([{
+def serialize_notification(n):
+    return {
         'id': n.id,
         'message': n.message,
         'is_read': n.is_read,
         'related_entity': n.related_entity,
         'related_entity_id': n.related_entity_id,
         'created_at': n.created_at.isoformat()
-    } for n in notifications])
+    }
+
+def create_notifications(rows):
+    """Вставляет уведомления одним пакетным INSERT в текущей транзакции.
+
+    rows — словари с user_id, message, related_entity, related_entity_id и
+    необязательным created_at. Все вставки уведомлений идут через эту функцию:
+    после коммита новые уведомления публикуются подключённым клиентам потока.
+    Без пакетного RETURNING (MySQL, MariaDB) строки вставляются через ORM.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    values = [{
+        'user_id': row['user_id'],
+        'message': row['message'],
+        'related_entity': row.get('related_entity'),
+        'related_entity_id': row.get('related_entity_id'),
+        'is_read': False,
+        'created_at': row.get('created_at') or now,
+        'updated_at': now
+    } for row in rows]
+    if bulk_returning_supported(db.session):
+        created = db.session.execute(
+            insert(Notification).returning(
+                Notification.id, Notification.user_id, Notification.message, Notification.is_read,
+                Notification.related_entity, Notification.related_entity_id, Notification.created_at,
+                sort_by_parameter_order=True
+            ),
+            values
+        ).all()
+    else:
+        created = [Notification(**value) for value in values]
+        db.session.add_all(created)
+        db.session.flush()
+    adjust_unread_counters(Counter(n.user_id for n in created))
+    events = [(n.user_id, serialize_notification(n)) for n in created]
+    after_commit(lambda: hub.publish(events))
+
+def adjust_unread_counters(deltas):
+    """Сдвигает счётчики непрочитанных: deltas — {user_id: изменение}.
+
+    Пользователи с одинаковым сдвигом обновляются одним UPDATE. Недостающие
+    строки счётчиков пересчитываются по таблице уведомлений, поэтому функцию
+    вызывают после того, как изменение уведомлений добавлено в сессию.
+    """
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    if not by_delta:
+        return
+    
+    now = datetime.utcnow()
+    for delta, user_ids in by_delta.items():
+        db.session.execute(
+            update(UserNotificationCounter)
+            .where(UserNotificationCounter.user_id.in_(user_ids))
+            .values(unread_count=UserNotificationCounter.unread_count + delta, updated_at=now)
+        )
+    
+    user_ids = [user_id for ids in by_delta.values() for user_id in ids]
+    existing = set(db.session.scalars(
+        select(UserNotificationCounter.user_id).where(UserNotificationCounter.user_id.in_(user_ids))
+    ))
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if missing:
+        db.session.flush()
+        db.session.execute(
+            insert(UserNotificationCounter).from_select(
+                ['user_id', 'unread_count', 'updated_at'],
+                _unread_counts_query().where(User.id.in_(missing))
+            )
+        )
+
+def rebuild_unread_counters():
+    """Пересчитывает счётчики непрочитанных всех пользователей одним запросом.
+
+    Строку получает каждый пользователь, в том числе без непрочитанных, чтобы
+    unread_count не уходил в COUNT(*) по уведомлениям.
+    """
+    db.session.execute(delete(UserNotificationCounter))
+    db.session.execute(
+        insert(UserNotificationCounter).from_select(
+            ['user_id', 'unread_count', 'updated_at'],
+            _unread_counts_query()
+        )
+    )
+    db.session.commit()
+
+def _unread_counts_query():
+    return (
+        select(
+            User.id,
+            func.count(Notification.id),
+            literal(datetime.utcnow(), db.DateTime)
+        )
+        .select_from(User)
+        .outerjoin(Notification, (Notification.user_id == User.id) & (Notification.is_read == False))
+        .group_by(User.id)
+    )
+
+def unread_count(user_id):
+    """Число непрочитанных уведомлений пользователя по счётчику.
+
+    Строка счётчика заводится вместе с пользователем; подсчёт по таблице
+    уведомлений — запасной путь для строк, созданных в обход ORM.
+    """
+    count = db.session.scalar(
+        select(UserNotificationCounter.unread_count).where(UserNotificationCounter.user_id == user_id)
+    )
+    if count is None:
+        count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
+    return count
+
+@notifications_bp.route('/notifications', methods=['GET'])
+@jwt_required()
+def get_notifications():
+    """Получение ленты уведомлений текущего пользователя (доступно любому авторизованному пользователю).
+
+    Постраничная выдача по ключу (created_at, id): limit, cursor из заголовка
+    X-Next-Cursor предыдущей страницы, фильтры unread_only, related_entity,
+    related_entity_id. Без limit и cursor лента отдаётся целиком.
+    """
+    current_user_id = int(get_jwt_identity())
+    
+    try:
+        limit = parse_limit(default=50, maximum=200) if is_paginated() else None
+        cursor = decode_cursor(datetime, int)
+    except InvalidListingParams as e:
+        return jsonify({"error": str(e)}), 400
+    
+    query = Notification.query.filter_by(user_id=current_user_id)
+    if parse_bool('unread_only'):
+        query = query.filter(Notification.is_read == False)
+    if request.args.get('related_entity'):
+        query = query.filter(Notification.related_entity == request.args['related_entity'])
+    if request.args.get('related_entity_id', type=int) is not None:
+        query = query.filter(Notification.related_entity_id == request.args.get('related_entity_id', type=int))
+    if cursor:
+        query = query.filter(tuple_(Notification.created_at, Notification.id) < cursor)
+    
+    query = query.order_by(Notification.created_at.desc(), Notification.id.desc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    notifications = query.all()
+    notifications, next_cursor = paginate(notifications, limit, lambda n: (n.created_at, n.id))
+    
+    return with_next_cursor(jsonify([serialize_notification(n) for n in notifications]), next_cursor)
+
+@notifications_bp.route('/unread-count', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    """Число непрочитанных уведомлений текущего пользователя (доступно любому авторизованному пользователю).
+
+    Читается из счётчика одной строкой; при совпадении If-None-Match
+    возвращается 304.
+    """
+    current_user_id = int(get_jwt_identity())
+    count = unread_count(current_user_id)
+    return conditional_json(f'unread-{current_user_id}-{count}', lambda: {'unread_count': count})
+
+def _notifications_after(user_id, last_id, limit):
+    """Следующая страница уведомлений с id больше last_id."""
+    return Notification.query.filter(
+        Notification.user_id == user_id,
+        Notification.id > last_id
+    ).order_by(Notification.id).limit(limit).all()
+
+def _late_notifications(user_id, last_id, since, sent_ids, limit):
+    """Ещё не отправленные уведомления с id не больше last_id, созданные не раньше since.
+
+    Подбирает уведомления, чья транзакция закоммитилась позже уже
+    отправленных уведомлений с большим id.
+    """
+    return Notification.query.filter(
+        Notification.user_id == user_id,
+        Notification.id <= last_id,
+        Notification.created_at >= since,
+        Notification.id.notin_(sent_ids)
+    ).order_by(Notification.id).limit(limit).all()
+
+@notifications_bp.route('/stream-ticket', methods=['POST'])
+@jwt_required()
+def create_stream_ticket():
+    """Короткоживущий билет для подключения к потоку уведомлений.
+
+    EventSource не умеет передавать заголовки, а токен доступа в строке
+    запроса оседал бы в журналах; билет годится только для /stream и
+    только NOTIFICATION_STREAM_TICKET_TTL секунд.
+    """
+    current_user_id = int(get_jwt_identity())
+    return jsonify({
+        'ticket': issue_stream_ticket(current_user_id),
+        'expires_in': current_app.config['NOTIFICATION_STREAM_TICKET_TTL']
+    })
+
+@notifications_bp.route('/stream', methods=['GET'])
+@jwt_required(optional=True)
+def stream_notifications():
+    """Поток новых уведомлений текущего пользователя в формате server-sent events.
+
+    Авторизация — заголовком Authorization или параметром ticket (билет из
+    POST /notifications/stream-ticket). Событие notification несёт
+    уведомление и его id; после переподключения браузер присылает
+    Last-Event-ID (или параметр last_event_id), и поток досылает только
+    пропущенное. Раз в NOTIFICATION_STREAM_POLL_INTERVAL секунд приходит
+    событие unread с числом непрочитанных; заодно из базы дочитываются
+    уведомления, созданные другими процессами.
+    """
+    identity = get_jwt_identity()
+    current_user_id = int(identity) if identity is not None else read_stream_ticket(request.args.get('ticket'))
+    if current_user_id is None:
+        return jsonify({"error": "Требуется токен доступа или действующий билет потока"}), 401
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Некорректный Last-Event-ID"}), 400
+    
+    app = current_app._get_current_object()
+    poll_interval = app.config['NOTIFICATION_STREAM_POLL_INTERVAL']
+    max_age = app.config['NOTIFICATION_STREAM_MAX_AGE']
+    backlog_limit = app.config['NOTIFICATION_STREAM_BACKLOG']
+    reorder_window = timedelta(seconds=app.config['NOTIFICATION_STREAM_REORDER_WINDOW'])
+    connected_at = datetime.utcnow()
+    sent = RecentIds()
+    
+    def poll(after_id):
+        """Возвращает last_id, пропущенные уведомления, признак недочитанного хвоста и счётчик."""
+        with app.app_context():
+            if after_id is None:
+                after_id = db.session.query(func.max(Notification.id)).filter(
+                    Notification.user_id == current_user_id
+                ).scalar() or 0
+                late, page = [], []
+            else:
+                since = max(connected_at, datetime.utcnow() - reorder_window)
+                late = _late_notifications(current_user_id, after_id, since, list(sent), backlog_limit)
+                page = _notifications_after(current_user_id, after_id, backlog_limit)
+            missed = [serialize_notification(n) for n in late + page]
+            return after_id, missed, len(page) == backlog_limit, unread_count(current_user_id)
+    
+    def generate():
+        nonlocal last_id
+        # Подписка до первого чтения из базы: уведомления, закоммиченные
+        # между чтением и подпиской, иначе потерялись бы.
+        subscription = hub.subscribe(current_user_id)
+        try:
+            yield f"retry: {app.config['NOTIFICATION_STREAM_RETRY_MS']}\n\n"
+            started = time.monotonic()
+            next_poll = started
+            while time.monotonic() - started < max_age:
+                if subscription.overflowed or time.monotonic() >= next_poll:
+                    subscription.overflowed = False
+                    last_id, missed, more, unread = poll(last_id)
+                    for item in missed:
+                        last_id = max(last_id, item['id'])
+                        if sent.add(item['id']):
+                            yield format_event(item, 'notification', item['id'])
+                    yield format_event({'count': unread}, 'unread')
+                    # Длинный хвост пропущенного дочитывается без ожидания.
+                    next_poll = time.monotonic() + (0 if more else poll_interval)
+                
+                timeout = min(next_poll, started + max_age) - time.monotonic()
+                item = subscription.get(timeout=max(timeout, 0))
+                if item is not None and sent.add(item['id']):
+                    last_id = max(last_id, item['id'])
+                    yield format_event(item, 'notification', item['id'])
+        finally:
+            hub.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
     
 @notifications_bp.route('/<int:notification_id>', methods=['PATCH'])
 @jwt_required()
@@ -30,8 +308,9 @@ def update_notification(notification_id):
     
     try:
         data = request.get_json()
-        if 'is_read' in data:
+        if 'is_read' in data and bool(data['is_read']) != bool(notification.is_read):
             notification.is_read = data['is_read']
+            adjust_unread_counters({current_user_id: -1 if notification.is_read else 1})
         notification.updated_at = datetime.utcnow()
         db.session.commit()
         return jsonify({"message": "Уведомление обновлено"})
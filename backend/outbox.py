@@ -0,0 +1,199 @@
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, update
+from models import db, NotificationOutbox, ProjectMember, RACIAssignment
+from notifications import create_notifications
+from reference import roles
+from session_hooks import after_commit
+
+# Режимы рассылки (OUTBOX_MODE):
+# thread — события разбирает фоновый поток процесса приложения;
+# worker — события разбирает отдельный процесс `python outbox.py`;
+# inline — уведомления создаются сразу в транзакции запроса (без очереди).
+OUTBOX_MODES = ('thread', 'worker', 'inline')
+
+
+def to_users(*user_ids):
+    """Получатели — перечисленные пользователи."""
+    return {'type': 'users', 'user_ids': list(user_ids)}
+
+
+def to_project_members(project_id):
+    """Получатели — все участники проекта на момент рассылки."""
+    return {'type': 'project_members', 'project_id': project_id}
+
+
+def to_stage_role(stage_id, role):
+    """Получатели — пользователи с ролью RACI role в этапе на момент рассылки."""
+    return {'type': 'stage_role', 'stage_id': stage_id, 'role': role}
+
+
+def enqueue_notification(audience, message, related_entity, related_entity_id, exclude=()):
+    """Ставит рассылку уведомления в очередь одной строкой outbox.
+
+    Строка пишется в текущую транзакцию и разбирается диспетчером после
+    коммита; при откате транзакции уведомления не отправляются.
+    """
+    payload = {
+        'audience': audience,
+        'message': message,
+        'related_entity': related_entity,
+        'related_entity_id': related_entity_id,
+        'exclude': sorted(set(exclude))
+    }
+    if current_app.config.get('OUTBOX_MODE') == 'inline':
+        deliver(payload, datetime.utcnow())
+        return
+
+    db.session.add(NotificationOutbox(payload=payload, created_at=datetime.utcnow()))
+    dispatcher = current_app.extensions.get('outbox')
+    if dispatcher is not None:
+        after_commit(dispatcher.wake)
+
+
+def _recipients(audience):
+    kind = audience['type']
+    if kind == 'users':
+        return audience['user_ids']
+    if kind == 'project_members':
+        return db.session.scalars(
+            select(ProjectMember.user_id).where(ProjectMember.project_id == audience['project_id'])
+        ).all()
+    if kind == 'stage_role':
+        role_id = roles.id_for(audience['role'])
+        if role_id is None:
+            return []
+        return db.session.scalars(
+            select(RACIAssignment.user_id).where(
+                RACIAssignment.stage_id == audience['stage_id'],
+                RACIAssignment.role_id == role_id
+            ).distinct()
+        ).all()
+    raise ValueError(f'Неизвестный тип получателей: {kind}')
+
+
+def deliver(payload, created_at):
+    """Разворачивает событие в уведомления получателей одним пакетным INSERT."""
+    exclude = set(payload.get('exclude') or ())
+    recipients = dict.fromkeys(
+        user_id for user_id in _recipients(payload['audience']) if user_id not in exclude
+    )
+    create_notifications([{
+        'user_id': user_id,
+        'message': payload['message'],
+        'related_entity': payload.get('related_entity'),
+        'related_entity_id': payload.get('related_entity_id'),
+        'created_at': created_at
+    } for user_id in recipients])
+    return len(recipients)
+
+
+def dispatch_pending(batch_size=100, max_attempts=5):
+    """Разбирает до batch_size необработанных событий и возвращает их число.
+
+    Каждое событие обрабатывается в своей транзакции: строка сначала
+    захватывается условным UPDATE (processed_at IS NULL), поэтому несколько
+    диспетчеров не разошлют одно событие дважды. Ошибка откатывает только
+    своё событие; после max_attempts неудачных попыток оно больше не берётся.
+    """
+    event_ids = db.session.scalars(
+        select(NotificationOutbox.id).where(
+            NotificationOutbox.processed_at.is_(None),
+            NotificationOutbox.attempts < max_attempts
+        ).order_by(NotificationOutbox.id).limit(batch_size)
+    ).all()
+    db.session.rollback()
+
+    for event_id in event_ids:
+        try:
+            claimed = db.session.execute(
+                update(NotificationOutbox).where(
+                    NotificationOutbox.id == event_id,
+                    NotificationOutbox.processed_at.is_(None)
+                ).values(processed_at=datetime.utcnow())
+            ).rowcount
+            if not claimed:
+                db.session.rollback()
+                continue
+            payload, created_at = db.session.execute(
+                select(NotificationOutbox.payload, NotificationOutbox.created_at)
+                .where(NotificationOutbox.id == event_id)
+            ).one()
+            deliver(payload, created_at)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            db.session.execute(
+                update(NotificationOutbox).where(NotificationOutbox.id == event_id).values(
+                    attempts=NotificationOutbox.attempts + 1,
+                    last_error=str(e)
+                )
+            )
+            db.session.commit()
+            current_app.logger.exception('Ошибка рассылки события outbox %s', event_id)
+    return len(event_ids)
+
+
+class OutboxDispatcher:
+    """Фоновый разбор очереди уведомлений.
+
+    В режиме thread поток запускается при первом запросе или событии и
+    просыпается после каждого коммита с новыми событиями; раз в
+    poll_interval секунд очередь проверяется и без сигнала (например, чтобы
+    забрать события, оставшиеся после перезапуска).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.poll_interval = app.config['OUTBOX_POLL_INTERVAL']
+        self.batch_size = app.config['OUTBOX_BATCH_SIZE']
+        self.max_attempts = app.config['OUTBOX_MAX_ATTEMPTS']
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or self.app.config['OUTBOX_MODE'] != 'thread':
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run_forever, name='outbox-dispatcher', daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        self.start()
+        self._event.set()
+
+    def drain(self):
+        """Разбирает очередь до конца."""
+        with self.app.app_context():
+            while dispatch_pending(self.batch_size, self.max_attempts) == self.batch_size:
+                pass
+
+    def run_forever(self):
+        while True:
+            self._event.clear()
+            try:
+                self.drain()
+            except Exception:
+                self.app.logger.exception('Ошибка диспетчера outbox')
+            self._event.wait(self.poll_interval)
+
+
+def init_outbox(app):
+    """Регистрирует диспетчер outbox в приложении."""
+    if app.config['OUTBOX_MODE'] not in OUTBOX_MODES:
+        raise ValueError(f"OUTBOX_MODE должен быть одним из: {', '.join(OUTBOX_MODES)}")
+    dispatcher = OutboxDispatcher(app)
+    app.extensions['outbox'] = dispatcher
+    app.before_request(dispatcher.start)
+    return dispatcher
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    print("Обработчик outbox запущен")
+    app.extensions['outbox'].run_forever()
@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+DEFAULT_HASH_METHOD = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+
+
+def _process_context():
+    """Способ запуска процессов пула.
+
+    spawn и forkserver в каждом воркере заново выполняют запущенный скрипт,
+    а скрипты вроде create_admin.py создают приложение прямо на верхнем
+    уровне. Поэтому используется fork, но только пока в процессе нет других
+    потоков: копия чужой захваченной блокировки (логирования, пула
+    соединений) навсегда повесила бы воркер. Пул запускается из
+    init_passwords, до потоков outbox и аудита; spawn остаётся для
+    пересоздания упавшего пула в уже многопоточном процессе.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods() and threading.active_count() == 1:
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('spawn')
+
+
+def _normalize_method(method):
+    """Полный префикс хеша, который werkzeug запишет для method.
+
+    werkzeug дополняет недостающие параметры значениями по умолчанию:
+    "scrypt" превращается в "scrypt:32768:8:1", "pbkdf2" — в
+    "pbkdf2:sha256:<итерации>".
+    """
+    name, *params = method.split(':')
+    if name == 'scrypt':
+        defaults = [str(2 ** 15), '8', '1']
+    elif name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ':'.join([name, *params, *defaults[len(params):]])
+
+
+class PasswordPoolBusy(Exception):
+    """Пул проверки паролей перегружен или не ответил вовремя; запрос стоит повторить позже."""
+
+
+class PasswordHasher:
+    """Хеширование и проверка паролей в ограниченном пуле процессов.
+
+    PBKDF2 занимает процессор на сотни миллисекунд, поэтому считается вне
+    потока запроса. Одновременно в пуле может быть не больше max_pending
+    операций; сверх этого операция сразу отклоняется с PasswordPoolBusy,
+    а не встаёт в очередь, которая только увеличила бы задержку у всех.
+    В режиме inline (по умолчанию до init_passwords) всё считается в
+    вызывающем потоке.
+    """
+
+    def __init__(self):
+        self.method = DEFAULT_HASH_METHOD
+        self.mode = 'inline'
+        self.workers = 1
+        self.max_pending = 1
+        self.timeout = None
+        self.rejected = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def configure(self, method, mode, workers, max_pending, timeout):
+        self.shutdown()
+        self.method = _normalize_method(method)
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+    def start(self):
+        """Заранее поднимает воркеры пула (с fork они создаются все сразу)."""
+        if self.mode != 'inline' and multiprocessing.parent_process() is None:
+            self._pool().submit(int).result()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_process_context())
+        return self._executor
+
+    def _run(self, function, *args):
+        if self.mode == 'inline':
+            return function(*args)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self._pending += 1
+        try:
+            future = self._pool().submit(function, *args)
+        except BrokenProcessPool:
+            self._release()
+            self.shutdown()
+            raise PasswordPoolBusy()
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordPoolBusy()
+        except BrokenProcessPool:
+            # Воркер упал; следующий вызов поднимет пул заново.
+            self.shutdown()
+            raise PasswordPoolBusy()
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Хеш посчитан другим алгоритмом или с другим числом итераций."""
+        return password_hash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+hasher = PasswordHasher()
+
+
+def init_passwords(app):
+    """Настраивает пул паролей из конфигурации приложения и его метрики."""
+    from metrics import register_gauge
+
+    hasher.configure(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        mode=app.config['PASSWORD_POOL'],
+        workers=app.config['PASSWORD_POOL_WORKERS'] or os.cpu_count() or 1,
+        max_pending=app.config['PASSWORD_POOL_MAX_PENDING'],
+        timeout=app.config['PASSWORD_POOL_TIMEOUT']
+    )
+    hasher.start()
+    register_gauge('password_pool_pending', 'Операции с паролями в пуле (в работе и в очереди)',
+                   lambda: hasher.pending)
+    register_gauge('password_pool_rejected_total', 'Операции с паролями, отклонённые из-за перегрузки пула',
+                   lambda: hasher.rejected, kind='counter')
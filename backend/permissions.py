@@ -0,0 +1,126 @@
+from flask import g, has_app_context
+from models import db, UserPosition, ProjectMember, ProjectStage, RACIAssignment
+from cache import TTLCache, MISSING
+from session_hooks import after_transaction
+from reference import roles, positions
+
+ADMIN_POSITION = 'Администратор'
+
+# Общий для процесса кэш проверок доступа. Поверх него в пределах одного
+# запроса работает memo в flask.g, поэтому повторные проверки внутри запроса
+# не трогают ни базу, ни блокировку кэша.
+_cache = TTLCache(maxsize=10000, ttl=30)
+
+
+def configure_permission_cache(app):
+    """Настраивает размер и время жизни кэша прав из конфигурации приложения."""
+    _cache.configure(
+        maxsize=app.config.get('PERMISSION_CACHE_SIZE'),
+        ttl=app.config.get('PERMISSION_CACHE_TTL')
+    )
+
+
+def _memo():
+    if not has_app_context():
+        return {}
+    if '_permissions' not in g:
+        g._permissions = {}
+    return g._permissions
+
+
+def _cached(key, loader):
+    memo = _memo()
+    if key in memo:
+        return memo[key]
+    value = _cache.get(key)
+    if value is MISSING:
+        value = loader()
+        _cache.set(key, value)
+    memo[key] = value
+    return value
+
+
+def is_admin(user_id):
+    """Проверяет, является ли пользователь администратором."""
+    admin_position_id = positions.id_for(ADMIN_POSITION)
+    if admin_position_id is None:
+        return False
+
+    def load():
+        return db.session.query(UserPosition.id).filter_by(
+            user_id=user_id,
+            position_id=admin_position_id
+        ).first() is not None
+
+    return _cached(('admin', user_id), load)
+
+
+def is_project_member(user_id, project_id):
+    """Проверяет, является ли пользователь участником проекта."""
+    if project_id is None:
+        return False
+
+    def load():
+        return db.session.query(ProjectMember.id).filter_by(
+            user_id=user_id,
+            project_id=project_id
+        ).first() is not None
+
+    return _cached(('member', user_id, project_id), load)
+
+
+def stage_project_id(stage_id):
+    """Возвращает id проекта, которому принадлежит этап, или None, если этапа нет."""
+    def load():
+        return db.session.query(ProjectStage.project_id).filter_by(id=stage_id).scalar()
+
+    return _cached(('stage', stage_id), load)
+
+
+def has_stage_role(user_id, stage_id, role_title):
+    """Проверяет, назначена ли пользователю RACI-роль role_title на этапе."""
+    role_id = roles.id_for(role_title)
+    if role_id is None:
+        return False
+
+    def load():
+        return db.session.query(RACIAssignment.role_id).filter_by(
+            stage_id=stage_id,
+            user_id=user_id
+        ).scalar()
+
+    return _cached(('stage_role', user_id, stage_id), load) == role_id
+
+
+def _invalidate(predicate):
+    def discard():
+        _cache.discard_where(predicate)
+        memo = _memo()
+        for key in [k for k in memo if predicate(k)]:
+            del memo[key]
+
+    discard()
+    after_transaction(discard)
+
+
+def invalidate_user_positions(user_id=None):
+    """Сбрасывает кэш прав администратора (для одного или всех пользователей)."""
+    _invalidate(lambda key: key[0] == 'admin' and user_id in (None, key[1]))
+
+
+def invalidate_project_members(project_id, user_id=None):
+    """Сбрасывает кэш членства в проекте."""
+    _invalidate(lambda key: key[0] == 'member' and key[2] == project_id
+                and user_id in (None, key[1]))
+
+
+def invalidate_stage_roles(*stage_ids):
+    """Сбрасывает кэш RACI-ролей этапов."""
+    stage_ids = set(stage_ids)
+    _invalidate(lambda key: key[0] == 'stage_role' and key[2] in stage_ids)
+
+
+def invalidate_stage(stage_id):
+    """Сбрасывает все закэшированные сведения об удалённом этапе."""
+    _invalidate(lambda key: (key[0] == 'stage' and key[1] == stage_id)
+                or (key[0] == 'stage_role' and key[2] == stage_id))
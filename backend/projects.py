@@ -1,10 +1,23 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Project, ProjectMember, User, ProjectStage, Task, Notification, AuditLog, Role, Position, UserPosition
+from models import db, Project, ProjectMember, User, ProjectStage, StageTaskCounter, Position, UserPosition, RACIAssignment
 from datetime import datetime
 from marshmallow import Schema, fields, validate, ValidationError
-from admin import is_admin
+from permissions import is_admin, is_project_member, invalidate_project_members, invalidate_stage
+from dashboard import get_dashboard_data
+from reference import roles
+from http_cache import conditional_json, scope_etag
+from dependency_graph import invalidate_stage_graph, DEPENDENCY_POLICIES
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import or_, tuple_
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import func
+from outbox import enqueue_notification, to_users, to_project_members
+from audit import record_audit
+from raci import parse_assignments, apply_assignments, RaciUpdateError, MAX_RACI_STAGES
+from stage_order import next_sequence, move_stage, place_stage, parse_position, reorder_stages, StageOrderError
+from serialization import fetch_rows
+from listing import is_paginated, parse_limit, decode_cursor, paginate, with_next_cursor, prefix_range, InvalidListingParams
 
 
 class ProjectCreateSchema(Schema):
@@ -21,8 +34,22 @@ class ProjectUpdateSchema(Schema):
 class ProjectMemberSchema(Schema):
     user_id = fields.Int(required=True)
 
+class ProjectRaciAssignmentSchema(Schema):
+    user_id = fields.Int(required=True)
+    role_id = fields.Int(allow_none=True, load_default=None)
+
+class ProjectRaciSchema(Schema):
+    stage_ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1, max=MAX_RACI_STAGES))
+    assignments = fields.List(fields.Nested(ProjectRaciAssignmentSchema), required=True)
+    mode = fields.Str(load_default='replace', validate=validate.OneOf(['replace', 'merge']))
+
+class StageOrderSchema(Schema):
+    stage_ids = fields.List(fields.Int(), required=True)
+
 projects_bp = Blueprint('projects', __name__)
 
+POSITIONS_SEPARATOR = '\x1f'
+
 @projects_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_project():
@@ -49,15 +76,14 @@ def create_project():
             user_id=current_user_id,
             added_at=datetime.utcnow()
         ))
+        invalidate_project_members(project.id, current_user_id)
         
-        notification = Notification(
-            user_id=current_user_id,
-            message=f"Создан проект: {project.title}",
-            related_entity='project',
-            related_entity_id=project.id,
-            created_at=datetime.utcnow()
+        enqueue_notification(
+            to_users(current_user_id),
+            f"Создан проект: {project.title}",
+            'project',
+            project.id
         )
-        db.session.add(notification)
         
         db.session.commit()
         return jsonify({'id': project.id}), 201
@@ -76,19 +102,32 @@ def create_project():
 def get_project(project_id):
     """Получение деталей проекта (доступно участникам проекта)."""
     current_user_id = int(get_jwt_identity())
-    if not ProjectMember.query.filter_by(user_id=current_user_id, project_id=project_id).first():
+    if not is_project_member(current_user_id, project_id):
         return jsonify({'error': 'Доступ закрыт'}), 403
     
-    project = Project.query.get_or_404(project_id)
-    return jsonify({
-        'id': project.id,
-        'title': project.title,
-        'description': project.description,
-        'created_by': project.created_by,
-        'deadline': project.deadline.isoformat() if project.deadline else None,
-        'is_archived': project.is_archived,
-        'members': [m.user_id for m in project.members]
-    })
+    scope = db.session.query(
+        Project.updated_at,
+        func.count(ProjectMember.id),
+        func.max(ProjectMember.updated_at)
+    ).outerjoin(ProjectMember).filter(Project.id == project_id).group_by(Project.id).first()
+    if scope is None:
+        abort(404)
+
+    def build():
+        project = fetch_rows(db.session.query(
+            Project.id,
+            Project.title,
+            Project.description,
+            Project.created_by,
+            Project.deadline,
+            Project.is_archived
+        ).filter(Project.id == project_id))[0]
+        project['members'] = db.session.scalars(
+            db.select(ProjectMember.user_id).filter_by(project_id=project_id).order_by(ProjectMember.id)
+        ).all()
+        return project
+
+    return conditional_json(scope_etag(f'project-{project_id}', scope), build)
 
 @projects_bp.route('/<int:project_id>/stages/<int:stage_id>', methods=['DELETE'])
 @jwt_required()
@@ -100,6 +139,8 @@ def delete_project_stage(project_id, stage_id):
     
     stage = ProjectStage.query.filter_by(id=stage_id, project_id=project_id).first_or_404()
     db.session.delete(stage)
+    invalidate_stage(stage_id)
+    invalidate_stage_graph(stage_id)
     db.session.commit()
     return jsonify({'message': 'Этап удален'})
 
@@ -135,11 +176,10 @@ def update_project(project_id):
         
         project.updated_at = datetime.utcnow()
         
-        audit_log = AuditLog(
-            user_id=current_user_id,
-            action='update_project',
-            entity_type='project',
-            entity_id=project.id,
+        record_audit(
+            'update_project',
+            'project',
+            project.id,
             old_values=old_values,
             new_values={
                 'title': project.title,
@@ -147,20 +187,15 @@ def update_project(project_id):
                 'deadline': project.deadline.isoformat() if project.deadline else None,
                 'is_archived': project.is_archived
             },
-            timestamp=datetime.utcnow()
+            user_id=current_user_id
         )
-        db.session.add(audit_log)
         
-        members = ProjectMember.query.filter_by(project_id=project.id).all()
-        for member in members:
-            notification = Notification(
-                user_id=member.user_id,
-                message=f"Проект {project.title} обновлен",
-                related_entity='project',
-                related_entity_id=project.id,
-                created_at=datetime.utcnow()
-            )
-            db.session.add(notification)
+        enqueue_notification(
+            to_project_members(project.id),
+            f"Проект {project.title} обновлен",
+            'project',
+            project.id
+        )
         
         db.session.commit()
         return jsonify({'message': 'Проект обновлен'})
@@ -212,25 +247,23 @@ def add_project_member(project_id):
             added_at=datetime.utcnow()
         )
         db.session.add(member)
+        db.session.flush()
+        invalidate_project_members(project_id, data['user_id'])
         
-        notification = Notification(
-            user_id=data['user_id'],
-            message=f"Вы добавлены в проект: {project.title}",
-            related_entity='project',
-            related_entity_id=project.id,
-            created_at=datetime.utcnow()
+        enqueue_notification(
+            to_users(data['user_id']),
+            f"Вы добавлены в проект: {project.title}",
+            'project',
+            project.id
         )
-        db.session.add(notification)
         
-        audit_log = AuditLog(
-            user_id=current_user_id,
-            action='add_project_member',
-            entity_type='project_member',
-            entity_id=member.id,
+        record_audit(
+            'add_project_member',
+            'project_member',
+            member.id,
             new_values={'project_id': project_id, 'user_id': data['user_id']},
-            timestamp=datetime.utcnow()
+            user_id=current_user_id
         )
-        db.session.add(audit_log)
         
         db.session.commit()
         return jsonify({'message': 'Пользователь добавлен'}), 201
@@ -255,33 +288,57 @@ def remove_project_member(project_id, user_id):
     ).first_or_404()
     
     db.session.delete(member)
+    invalidate_project_members(project_id, user_id)
     db.session.commit()
     return jsonify({'message': 'Пользователь удален'})
 
 @projects_bp.route('/<int:project_id>/stages', methods=['POST'])
 @jwt_required()
 def create_project_stage(project_id):
-    """Создание нового этапа в проекте (доступно только администратору)."""
+    """Создание нового этапа в проекте (доступно только администратору).
+
+    Этап добавляется в конец проекта. Необязательный "sequence" — позиция
+    этапа в списке (с нуля), а не ключ сортировки: ключ всегда выдаётся
+    сервером.
+    """
     current_user_id = int(get_jwt_identity())
     if not is_admin(current_user_id):
         return jsonify({"error": "Требуются права администратора"}), 403
     
     data = request.get_json()
+    if data.get('dependency_policy', 'all') not in DEPENDENCY_POLICIES:
+        return jsonify({"error": "Недопустимая политика зависимостей"}), 400
+    try:
+        position = parse_position(data['sequence']) if data.get('sequence') is not None else None
+    except StageOrderError as e:
+        return jsonify({"error": e.message}), e.status
+    
     stage = ProjectStage(
         project_id=project_id,
         title=data['title'],
         status=data.get('status', 'planned'),
         deadline=datetime.fromisoformat(data['deadline']) if data.get('deadline') else None,
-        sequence=data.get('sequence', 0)
+        sequence=next_sequence(project_id),
+        dependency_policy=data.get('dependency_policy', 'all')
     )
+    stage.task_counter = StageTaskCounter(project_id=project_id)
     db.session.add(stage)
+    db.session.flush()
+    if position is not None:
+        place_stage(stage, position)
+    invalidate_stage(stage.id)
     db.session.commit()
     return jsonify({'id': stage.id}), 201
 
 @projects_bp.route('/<int:project_id>/stages/<int:stage_id>', methods=['PATCH'])
 @jwt_required()
 def update_project_stage(project_id, stage_id):
-    """Обновление данных этапа проекта (доступно только администратору)."""
+    """Обновление данных этапа проекта (доступно только администратору).
+
+    Перенос этапа: "after_id" (null — в начало), "before_id" (null — в
+    конец) или "sequence" — позиция в списке (с нуля), как при создании;
+    меняется ключ сортировки только переносимого этапа.
+    """
     current_user_id = int(get_jwt_identity())
     if not is_admin(current_user_id):
         return jsonify({"error": "Требуются права администратора"}), 403
@@ -293,7 +350,23 @@ def update_project_stage(project_id, stage_id):
     if 'status' in data: stage.status = data['status']
     if 'deadline' in data: 
         stage.deadline = datetime.fromisoformat(data['deadline']) if data['deadline'] else None
-    if 'sequence' in data: stage.sequence = data['sequence']
+    if 'dependency_policy' in data:
+        if data['dependency_policy'] not in DEPENDENCY_POLICIES:
+            return jsonify({"error": "Недопустимая политика зависимостей"}), 400
+        stage.dependency_policy = data['dependency_policy']
+
+    moves = [key for key in ('after_id', 'before_id', 'sequence') if key in data]
+    if len(moves) > 1:
+        return jsonify({"error": "Укажите только одно из полей after_id, before_id, sequence"}), 400
+    if moves:
+        try:
+            if moves[0] == 'sequence':
+                place_stage(stage, parse_position(data['sequence']))
+            else:
+                move_stage(stage, data[moves[0]], before=moves[0] == 'before_id')
+        except StageOrderError as e:
+            db.session.rollback()
+            return jsonify({"error": e.message}), e.status
     
     db.session.commit()
     return jsonify({'message': 'Этап обновлен'})
@@ -304,65 +377,97 @@ def get_projects():
 
     """Получение списка проектов, в которых участвует текущий пользователь."""
     current_user_id = int(get_jwt_identity())
-    projects = Project.query.join(ProjectMember).filter(
+    scope = db.session.query(
+        func.count(ProjectMember.id),
+        func.max(ProjectMember.updated_at),
+        func.max(Project.updated_at)
+    ).join(Project, Project.id == ProjectMember.project_id).filter(ProjectMember.user_id == current_user_id).one()
+
+    return conditional_json(scope_etag(f'projects-{current_user_id}', scope), lambda: fetch_rows(db.session.query(
+        Project.id,
+        Project.title,
+        Project.description,
+        Project.created_by,
+        Project.deadline,
+        Project.is_archived
+    ).join(ProjectMember).filter(
         ProjectMember.user_id == current_user_id
-    ).all()
-    
-    return jsonify([{
-        'id': p.id,
-        'title': p.title,
-        'description': p.description,
-        'created_by': p.created_by,
-        'deadline': p.deadline.isoformat() if p.deadline else None,
-        'is_archived': p.is_archived
-    } for p in projects])
+    )))
 
 @projects_bp.route('/<int:project_id>/members', methods=['GET'])
 @jwt_required()
 def get_project_members(project_id):
-    try:
-        current_user_id = int(get_jwt_identity())
-        
-        project = Project.query.get_or_404(project_id)
-
-        is_member = ProjectMember.query.filter_by(
-            project_id=project_id,
-            user_id=current_user_id
-        ).first() is not None
+    """Список участников проекта с их должностями (доступно участникам проекта и администратору).
 
-        is_admin_user = User.query.get(current_user_id).positions.filter(
-            Position.title == 'Администратор'
-        ).first() is not None
+    Одна выборка с агрегированными должностями; параметры: limit, cursor,
+    q — префикс имени или ФИО без учёта регистра, position_id — фильтр по должности.
+    Без limit и cursor список отдаётся целиком.
+    """
+    current_user_id = int(get_jwt_identity())
+    Project.query.get_or_404(project_id)
 
-        if not (is_member or is_admin_user):
-            return jsonify({"error": "Доступ запрещён"}), 403
+    if not (is_project_member(current_user_id, project_id) or is_admin(current_user_id)):
+        return jsonify({"error": "Доступ запрещён"}), 403
 
-        members = ProjectMember.query.filter_by(project_id=project_id).all()
+    try:
+        limit = parse_limit(default=100, maximum=500) if is_paginated() else None
+        cursor = decode_cursor(str, int)
+    except InvalidListingParams as e:
+        return jsonify({"error": str(e)}), 400
 
-        members_data = []
-        for member in members:
-            user = User.query.get(member.user_id)
-            if not user:
-                continue
+    try:
+        query = db.session.query(
+            User.id,
+            User.username,
+            User.full_name,
+            User.email,
+            User.phone,
+            func.aggregate_strings(Position.title, POSITIONS_SEPARATOR)
+        ).join(
+            ProjectMember,
+            (ProjectMember.user_id == User.id) & (ProjectMember.project_id == project_id)
+        ).outerjoin(
+            UserPosition, UserPosition.user_id == User.id
+        ).outerjoin(
+            Position, Position.id == UserPosition.position_id
+        )
 
-            user_positions = (
-                db.session.query(Position.title)
-                .join(UserPosition, UserPosition.position_id == Position.id)
-                .filter(UserPosition.user_id == user.id)
-                .all()
+        search = request.args.get('q', '').strip().lower()
+        if search:
+            query = query.filter(or_(
+                prefix_range(User.username_search, search),
+                prefix_range(User.full_name_search, search)
+            ))
+        position_id = request.args.get('position_id', type=int)
+        if position_id is not None:
+            position_filter = aliased(UserPosition)
+            query = query.filter(
+                db.session.query(position_filter.id).filter(
+                    position_filter.user_id == User.id,
+                    position_filter.position_id == position_id
+                ).exists()
             )
-            positions_list = [pos.title for pos in user_positions]
+        if cursor:
+            query = query.filter(tuple_(User.username, User.id) > cursor)
 
-            members_data.append({
-                "user_id": user.id,
-                "username": user.username,
-                "full_name": user.full_name or user.username,
-                "email": user.email,
-                "phone": user.phone,
-                "positions": positions_list
-            })
+        query = query.group_by(
+            User.id, User.username, User.full_name, User.email, User.phone
+        ).order_by(User.username, User.id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        rows = query.all()
+        rows, next_cursor = paginate(rows, limit, lambda row: (row.username, row.id))
 
-        return jsonify(members_data), 200
+        members_data = [{
+            "user_id": user_id,
+            "username": username,
+            "full_name": full_name or username,
+            "email": email,
+            "phone": phone,
+            "positions": sorted(titles.split(POSITIONS_SEPARATOR)) if titles else []
+        } for user_id, username, full_name, email, phone, titles in rows]
+
+        return with_next_cursor(jsonify(members_data), next_cursor), 200
 
     except Exception as e:
         print(f"Error in get_project_members: {str(e)}")
@@ -373,20 +478,176 @@ def get_project_members(project_id):
 def get_project_stages(project_id):
     """Получение списка этапов проекта (доступно участникам проекта)."""
     current_user_id = int(get_jwt_identity())
-    if not ProjectMember.query.filter_by(
-        user_id=current_user_id,
-        project_id=project_id
-    ).first():
+    if not is_project_member(current_user_id, project_id):
         return jsonify({'error': 'Доступ закрыт'}), 403
     
-    stages = ProjectStage.query.filter_by(project_id=project_id).order_by(ProjectStage.sequence).all()
-    return jsonify([{
-        'id': s.id,
-        'title': s.title,
-        'status': s.status,
-        'deadline': s.deadline.isoformat() if s.deadline else None,
-        'sequence': s.sequence
-    } for s in stages])
+    scope = db.session.query(
+        func.count(ProjectStage.id),
+        func.max(ProjectStage.updated_at)
+    ).filter(ProjectStage.project_id == project_id).one()
+
+    return conditional_json(scope_etag(f'stages-{project_id}', scope), lambda: fetch_rows(db.session.query(
+        ProjectStage.id,
+        ProjectStage.title,
+        ProjectStage.status,
+        ProjectStage.deadline,
+        ProjectStage.sequence,
+        func.coalesce(ProjectStage.dependency_policy, 'all').label('dependency_policy')
+    ).filter(ProjectStage.project_id == project_id).order_by(ProjectStage.sequence, ProjectStage.id)))
+
+@projects_bp.route('/<int:project_id>/stages/order', methods=['PUT'])
+@jwt_required()
+def reorder_project_stages(project_id):
+    """Задаёт порядок всех этапов проекта (доступно только администратору).
+
+    Тело: {"stage_ids": [...]} — все этапы проекта в новом порядке.
+    Переписываются ключи только тех этапов, которые действительно сдвинулись.
+    """
+    current_user_id = int(get_jwt_identity())
+    if not is_admin(current_user_id):
+        return jsonify({"error": "Требуются права администратора"}), 403
+    try:
+        data = StageOrderSchema().load(request.get_json())
+    except ValidationError as e:
+        return jsonify({"error": "Некорректные данные", "details": e.messages}), 400
+
+    Project.query.get_or_404(project_id)
+    try:
+        updated = reorder_stages(project_id, data['stage_ids'])
+        db.session.commit()
+    except StageOrderError as e:
+        db.session.rollback()
+        return jsonify({"error": e.message}), e.status
+    return jsonify({'updated': updated})
+
+@projects_bp.route('/<int:project_id>/raci-matrix', methods=['GET'])
+@jwt_required()
+def get_raci_matrix(project_id):
+    """RACI-матрица проекта одним ответом (доступно участникам проекта).
+
+    stages — этапы по порядку; users и roles — словари по id; members — id
+    участников в порядке имени пользователя; cells — тройки
+    [stage_id, user_id, role_id]. В users есть и назначенные по RACI
+    пользователи, которых уже нет в проекте. Ответ валидируется по ETag.
+    """
+    current_user_id = int(get_jwt_identity())
+    if not is_project_member(current_user_id, project_id):
+        return jsonify({'error': 'Доступ закрыт'}), 403
+
+    stage_ids = db.select(ProjectStage.id).where(ProjectStage.project_id == project_id)
+    member_ids = db.select(ProjectMember.user_id).where(ProjectMember.project_id == project_id)
+    in_matrix = RACIAssignment.stage_id.in_(stage_ids)
+    user_ids = member_ids.union(db.select(RACIAssignment.user_id).where(in_matrix))
+
+    def aggregate(*columns, where):
+        return db.select(*columns).where(where).scalar_subquery()
+
+    scope = db.session.query(
+        aggregate(func.count(ProjectStage.id), where=ProjectStage.project_id == project_id),
+        aggregate(func.max(ProjectStage.updated_at), where=ProjectStage.project_id == project_id),
+        aggregate(func.count(ProjectMember.id), where=ProjectMember.project_id == project_id),
+        aggregate(func.max(ProjectMember.updated_at), where=ProjectMember.project_id == project_id),
+        aggregate(func.count(RACIAssignment.id), where=in_matrix),
+        aggregate(func.max(RACIAssignment.updated_at), where=in_matrix),
+        aggregate(func.max(User.updated_at), where=User.id.in_(user_ids))
+    ).one()
+
+    def build():
+        stages = fetch_rows(db.session.query(
+            ProjectStage.id,
+            ProjectStage.title,
+            ProjectStage.status,
+            ProjectStage.deadline,
+            ProjectStage.sequence
+        ).filter(ProjectStage.project_id == project_id).order_by(ProjectStage.sequence, ProjectStage.id))
+
+        users = {}
+        members = []
+        for user_id, username, full_name, is_member in db.session.query(
+            User.id,
+            User.username,
+            User.full_name,
+            User.id.in_(member_ids)
+        ).filter(User.id.in_(user_ids)).order_by(User.username, User.id):
+            users[user_id] = {'username': username, 'full_name': full_name or username}
+            if is_member:
+                members.append(user_id)
+
+        cells = [tuple(row) for row in db.session.query(
+            RACIAssignment.stage_id,
+            RACIAssignment.user_id,
+            RACIAssignment.role_id
+        ).filter(in_matrix).order_by(RACIAssignment.stage_id, RACIAssignment.user_id)]
+
+        return {
+            'stages': stages,
+            'users': users,
+            'members': members,
+            'roles': {role['id']: {'title': role['title'], 'is_custom': role['is_custom']} for role in roles.items()},
+            'cells': cells
+        }
+
+    return conditional_json(scope_etag(f'raci-{project_id}-{roles.etag()[:8]}', scope), build)
+
+@projects_bp.route('/<int:project_id>/raci', methods=['PUT'])
+@jwt_required()
+def update_project_raci(project_id):
+    """Применяет один набор RACI-назначений сразу к нескольким этапам проекта.
+
+    Тело: {"stage_ids": [...], "assignments": [{"user_id", "role_id"}],
+    "mode": "replace" | "merge"}. replace делает назначения каждого этапа
+    равными набору; merge меняет только перечисленных пользователей
+    (role_id: null снимает назначение). Изменяются только отличающиеся
+    назначения. Доступно администратору и ответственному (A) всех этапов.
+    """
+    current_user_id = int(get_jwt_identity())
+    try:
+        data = ProjectRaciSchema().load(request.get_json())
+    except ValidationError as e:
+        return jsonify({"error": "Некорректные данные", "details": e.messages}), 400
+
+    stage_ids = list(dict.fromkeys(data['stage_ids']))
+    found = set(db.session.scalars(db.select(ProjectStage.id).where(
+        ProjectStage.project_id == project_id,
+        ProjectStage.id.in_(stage_ids)
+    )))
+    missing = [stage_id for stage_id in stage_ids if stage_id not in found]
+    if missing:
+        return jsonify({"error": f"Этапы не найдены в проекте: {missing}"}), 404
+
+    if not is_admin(current_user_id):
+        if not is_project_member(current_user_id, project_id):
+            return jsonify({"error": "Доступ запрещён"}), 403
+        led_stages = db.session.query(func.count(RACIAssignment.id)).filter(
+            RACIAssignment.stage_id.in_(stage_ids),
+            RACIAssignment.user_id == current_user_id,
+            RACIAssignment.role_id == roles.id_for('A')
+        ).scalar()
+        if led_stages != len(stage_ids):
+            return jsonify({"error": "Только руководитель всех этапов или админ могут изменять RACI"}), 403
+
+    replace = data['mode'] == 'replace'
+    try:
+        wanted = parse_assignments(data['assignments'], allow_removal=not replace)
+        counts = apply_assignments(stage_ids, wanted, assigned_by=current_user_id, replace=replace)
+        if any(counts.values()):
+            record_audit(
+                'update_raci',
+                'project',
+                project_id,
+                new_values={
+                    'mode': data['mode'],
+                    'stage_ids': stage_ids,
+                    'assignments': {str(user_id): role_id for user_id, role_id in wanted.items()},
+                    **counts
+                },
+                user_id=current_user_id
+            )
+        db.session.commit()
+    except RaciUpdateError as e:
+        db.session.rollback()
+        return jsonify({"error": e.message}), e.status
+    return jsonify(counts)
 
 @projects_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
@@ -394,52 +655,11 @@ def get_project_stages(project_id):
 def get_dashboard():
     """Получение данных для дашборда (доступно любому авторизованному пользователю)."""
     current_user_id = int(get_jwt_identity())
-    
-    projects = Project.query.join(ProjectMember).filter(
-        ProjectMember.user_id == current_user_id
-    ).all()
-    
-    notifications = Notification.query.filter_by(
-        user_id=current_user_id,
-        is_read=False
-    ).count()
-    
-    dashboard_data = {
-        'projects': [],
-        'unread_notifications': notifications,
-        'total_incomplete_tasks': 0
-    }
-    
-    for project in projects:
-        stages = ProjectStage.query.filter_by(project_id=project.id).all()
-        total_tasks = 0
-        completed_tasks = 0
-        
-        for stage in stages:
-            tasks = Task.query.filter_by(stage_id=stage.id).all()
-            total_tasks += len(tasks)
-            completed_tasks = sum(1 for task in tasks if task.is_completed)
-        
-        dashboard_data['projects'].append({
-            'id': project.id,
-            'title': project.title,
-            'total_tasks': total_tasks,
-            'completed_tasks': completed_tasks,
-            'progress': (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0,
-            'is_archived': project.is_archived
-        })
-        dashboard_data['total_incomplete_tasks'] += total_tasks - completed_tasks
-    
-    return jsonify(dashboard_data)
+    return jsonify(get_dashboard_data(current_user_id))
 
 @projects_bp.route('/roles', methods=['GET'])
 @jwt_required()
 
 def get_roles():
     """Получение списка всех ролей (доступно любому авторизованному пользователю)."""
-    roles = Role.query.all()
-    return jsonify([{
-        'id': r.id,
-        'title': r.title,
-        'is_custom': r.is_custom
-    } for r in roles])
\ No newline at end of file
+    return conditional_json(roles.etag(), roles.items)
\ No newline at end of file
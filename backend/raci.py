@@ -0,0 +1,109 @@
+from datetime import datetime
+from sqlalchemy import insert, update, delete
+from models import db, User, RACIAssignment
+from permissions import invalidate_stage_roles
+from reference import roles
+
+MAX_RACI_STAGES = 1000
+
+
+class RaciUpdateError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def parse_assignments(assignments, allow_removal=False):
+    """Проверяет список {"user_id", "role_id"} и возвращает словарь user_id → role_id.
+
+    allow_removal разрешает role_id = None (снять назначение пользователя).
+    """
+    wanted = {}
+    for assignment in assignments:
+        user_id = assignment['user_id']
+        role_id = assignment.get('role_id')
+        if user_id in wanted:
+            raise RaciUpdateError(f'Пользователь {user_id} указан дважды')
+        if role_id is None and not allow_removal:
+            raise RaciUpdateError(f'Для пользователя {user_id} не указана роль')
+        wanted[user_id] = role_id
+
+    known_roles = {role['id'] for role in roles.items()}
+    unknown_roles = {r for r in wanted.values() if r is not None} - known_roles
+    if unknown_roles:
+        raise RaciUpdateError(f'Неизвестные роли: {sorted(unknown_roles)}')
+
+    user_ids = [u for u, r in wanted.items() if r is not None]
+    if user_ids:
+        existing = set(db.session.scalars(db.select(User.id).where(User.id.in_(user_ids))))
+        missing = set(user_ids) - existing
+        if missing:
+            raise RaciUpdateError(f'Пользователи не найдены: {sorted(missing)}', status=404)
+    return wanted
+
+
+def apply_assignments(stage_ids, wanted, assigned_by, replace=True):
+    """Приводит RACI-назначения этапов к wanted (user_id → role_id) по разнице.
+
+    Текущие назначения всех этапов читаются одним запросом; затем одним
+    пакетом вставляются новые, одним — меняются роли и одним удаляются
+    лишние. Неизменённые назначения не трогаются и сохраняют assigned_at и
+    assigned_by. replace=False меняет только пользователей из wanted
+    (role_id = None снимает назначение), остальных оставляет.
+    Возвращает счётчики {"created", "updated", "deleted"}; коммит — за
+    вызывающим.
+    """
+    stage_ids = list(dict.fromkeys(stage_ids))
+    current = {}
+    for assignment_id, stage_id, user_id, role_id in db.session.query(
+        RACIAssignment.id, RACIAssignment.stage_id, RACIAssignment.user_id, RACIAssignment.role_id
+    ).filter(RACIAssignment.stage_id.in_(stage_ids)):
+        current[stage_id, user_id] = (assignment_id, role_id)
+
+    now = datetime.utcnow()
+    inserts, updates, deletes = [], [], []
+    changed_stages = set()
+    for stage_id in stage_ids:
+        for user_id, role_id in wanted.items():
+            existing = current.get((stage_id, user_id))
+            if role_id is None:
+                if existing:
+                    deletes.append(existing[0])
+                    changed_stages.add(stage_id)
+            elif existing is None:
+                inserts.append({
+                    'stage_id': stage_id,
+                    'user_id': user_id,
+                    'role_id': role_id,
+                    'assigned_by': assigned_by,
+                    'assigned_at': now,
+                    'created_at': now,
+                    'updated_at': now
+                })
+                changed_stages.add(stage_id)
+            elif existing[1] != role_id:
+                updates.append({
+                    'id': existing[0],
+                    'role_id': role_id,
+                    'assigned_by': assigned_by,
+                    'assigned_at': now,
+                    'updated_at': now
+                })
+                changed_stages.add(stage_id)
+    if replace:
+        for (stage_id, user_id), (assignment_id, _) in current.items():
+            if user_id not in wanted:
+                deletes.append(assignment_id)
+                changed_stages.add(stage_id)
+
+    if deletes:
+        db.session.execute(delete(RACIAssignment).where(RACIAssignment.id.in_(deletes)))
+    if updates:
+        db.session.execute(update(RACIAssignment), updates)
+    if inserts:
+        db.session.execute(insert(RACIAssignment), inserts)
+    if changed_stages:
+        invalidate_stage_roles(*changed_stages)
+
+    return {'created': len(inserts), 'updated': len(updates), 'deleted': len(deletes)}
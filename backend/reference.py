@@ -0,0 +1,89 @@
+import hashlib
+import json
+import threading
+import time
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Role, Position
+from session_hooks import after_transaction
+
+MISS_RELOAD_INTERVAL = 5
+
+
+class ReferenceRegistry:
+    """Копия небольшого справочника (роли, должности) в памяти процесса.
+
+    Загружается при старте приложения и перечитывается после изменений
+    справочника или по истечении refresh_interval секунд, чтобы изменения,
+    сделанные другими процессами, тоже подхватывались.
+    """
+
+    def __init__(self, model, fields, refresh_interval=300):
+        self.model = model
+        self.fields = fields
+        self.refresh_interval = refresh_interval
+        self._items = None
+        self._by_title = {}
+        self._etag = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        rows = db.session.query(*[getattr(self.model, f) for f in self.fields]) \
+            .order_by(self.model.id).all()
+        items = [dict(zip(self.fields, row)) for row in rows]
+        payload = json.dumps(items, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        with self._lock:
+            self._items = items
+            self._by_title = {item['title']: item['id'] for item in items}
+            self._etag = hashlib.sha256(payload).hexdigest()[:32]
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._items is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.load()
+
+    def items(self):
+        self._ensure_loaded()
+        return self._items
+
+    def etag(self):
+        self._ensure_loaded()
+        return self._etag
+
+    def id_for(self, title):
+        """Возвращает id записи по названию или None, если такой записи нет.
+
+        Промах по названию перечитывает справочник не чаще раза в MISS_RELOAD_INTERVAL
+        секунд: запись могла появиться в другом процессе.
+        """
+        self._ensure_loaded()
+        if title not in self._by_title and time.monotonic() - self._loaded_at > MISS_RELOAD_INTERVAL:
+            self.load()
+        return self._by_title.get(title)
+
+    def invalidate(self):
+        """Помечает справочник устаревшим после конца текущей транзакции."""
+        def reset():
+            with self._lock:
+                self._items = None
+        after_transaction(reset)
+
+
+roles = ReferenceRegistry(Role, ('id', 'title', 'is_custom'))
+positions = ReferenceRegistry(Position, ('id', 'title'))
+
+
+def init_reference_data(app):
+    """Загружает справочники при создании приложения.
+
+    Если таблиц ещё нет (база не создана), загрузка откладывается до первого
+    обращения.
+    """
+    interval = app.config.get('REFERENCE_DATA_TTL', 300)
+    with app.app_context():
+        for registry in (roles, positions):
+            registry.refresh_interval = interval
+            try:
+                registry.load()
+            except SQLAlchemyError:
+                db.session.rollback()
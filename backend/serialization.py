@@ -0,0 +1,47 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него работает стандартный json
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f'Объект типа {type(value).__name__} не сериализуется в JSON')
+
+
+def dumps_stdlib(data):
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_orjson(data):
+    # Даты orjson пишет сам в том же формате ISO 8601, что и isoformat();
+    # OPT_NON_STR_KEYS — для словарей с целыми ключами (id → объект).
+    return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+dumps = dumps_orjson if orjson is not None else dumps_stdlib
+
+
+def json_response(data, status=200):
+    """JSON-ответ, закодированный dumps(); datetime и date пишутся в ISO 8601."""
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+
+def fetch_rows(query):
+    """Выполняет выборку колонок и возвращает строки словарями «имя колонки → значение».
+
+    Запрос строится через db.session.query(Model.col, ...) без загрузки
+    ORM-объектов; имена ключей берутся из имён колонок или label().
+    """
+    result = query.session.execute(query.statement)
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
@@ -0,0 +1,59 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db
+
+DEFERRED = 'defer_after_commit'
+
+
+def after_commit(callback):
+    """Откладывает вызов callback до успешного коммита текущей сессии.
+
+    При откате транзакции отложенные вызовы отбрасываются.
+    """
+    db.session.info.setdefault('after_commit', []).append(callback)
+
+
+def after_transaction(callback):
+    """Откладывает вызов callback до конца транзакции — коммита или отката.
+
+    Для сброса кэшей: в откаченной транзакции кэш мог успеть заполниться
+    незакоммиченными данными.
+    """
+    db.session.info.setdefault('after_transaction', []).append(callback)
+
+
+def defer_after_commit(session):
+    """Копит отложенные вызовы сессии, пока их не запустит finish_deferred.
+
+    Нужно, когда session.commit() не завершает внешнюю транзакцию (пакетный
+    запрос в одной транзакции): вызовы должны сработать только после её
+    настоящего коммита.
+    """
+    session.info[DEFERRED] = True
+
+
+def finish_deferred(session, committed):
+    """Запускает накопленные вызовы после коммита или отката внешней транзакции."""
+    session.info.pop(DEFERRED, None)
+    _run(session, committed)
+
+
+def _run(session, committed):
+    callbacks = session.info.pop('after_commit', [])
+    if not committed:
+        callbacks = []
+    callbacks += session.info.pop('after_transaction', [])
+    for callback in callbacks:
+        callback()
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_after_commit(session):
+    if not session.info.get(DEFERRED):
+        _run(session, committed=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_commit(session):
+    if not session.info.get(DEFERRED):
+        _run(session, committed=False)
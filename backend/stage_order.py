@@ -0,0 +1,156 @@
+from bisect import bisect_left
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.sql import func
+from models import db, ProjectStage
+
+# Этапы проекта упорядочены по (sequence, id); новые ключи раздаются с шагом
+# SEQUENCE_GAP, чтобы перенос этапа между соседями менял одну строку.
+SEQUENCE_GAP = 1024
+
+
+class StageOrderError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def next_sequence(project_id):
+    """Ключ для нового этапа в конце проекта."""
+    last = db.session.query(func.max(ProjectStage.sequence)).filter(
+        ProjectStage.project_id == project_id
+    ).scalar()
+    return SEQUENCE_GAP if last is None else last + SEQUENCE_GAP
+
+
+def _ordered(project_id):
+    return db.session.query(ProjectStage.id, ProjectStage.sequence).filter(
+        ProjectStage.project_id == project_id
+    ).order_by(ProjectStage.sequence, ProjectStage.id).all()
+
+
+def _write(keys):
+    """Записывает новые ключи {stage_id: sequence} одним пакетным UPDATE."""
+    if keys:
+        now = datetime.utcnow()
+        db.session.execute(update(ProjectStage), [
+            {'id': stage_id, 'sequence': sequence, 'updated_at': now} for stage_id, sequence in keys.items()
+        ])
+    return len(keys)
+
+
+def renormalize(project_id, order=None):
+    """Раздаёт этапам ключи SEQUENCE_GAP, 2 * SEQUENCE_GAP, ... в порядке order.
+
+    По умолчанию сохраняет текущий порядок. Обновляет только этапы, ключ
+    которых изменился; возвращает их число.
+    """
+    current = dict(_ordered(project_id))
+    if order is None:
+        order = list(current)
+    return _write({
+        stage_id: (index + 1) * SEQUENCE_GAP
+        for index, stage_id in enumerate(order)
+        if current[stage_id] != (index + 1) * SEQUENCE_GAP
+    })
+
+
+def move_stage(stage, neighbour_id, before=False):
+    """Ставит этап после этапа neighbour_id или, при before, перед ним.
+
+    neighbour_id = None означает начало списка (или конец при before).
+    Новый ключ берётся посередине между соседями, поэтому обычно меняется
+    одна строка; если места между соседями нет, этапы проекта
+    перенумеровываются. Возвращает число обновлённых строк.
+    """
+    rows = [(stage_id, sequence) for stage_id, sequence in _ordered(stage.project_id) if stage_id != stage.id]
+    ids = [stage_id for stage_id, _ in rows]
+    if neighbour_id is None:
+        position = len(ids) if before else 0
+    elif neighbour_id in ids:
+        position = ids.index(neighbour_id) + (0 if before else 1)
+    else:
+        raise StageOrderError('Соседний этап не найден в проекте', status=404)
+
+    low = rows[position - 1][1] if position > 0 else 0
+    high = rows[position][1] if position < len(rows) else low + 2 * SEQUENCE_GAP
+    if high - low < 2:
+        ids.insert(position, stage.id)
+        changed = renormalize(stage.project_id, ids)
+    elif low < stage.sequence < high:
+        changed = 0
+    else:
+        changed = _write({stage.id: (low + high) // 2})
+    db.session.expire(stage, ['sequence', 'updated_at'])
+    return changed
+
+
+def parse_position(value):
+    """Проверяет позицию этапа в списке, переданную клиентом как "sequence"."""
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise StageOrderError('Позиция этапа должна быть неотрицательным целым числом')
+    return value
+
+
+def place_stage(stage, position):
+    """Ставит этап на позицию position (с нуля) среди этапов проекта.
+
+    Позиция за концом списка делает этап последним. Возвращает число
+    обновлённых строк.
+    """
+    ids = [stage_id for stage_id, _ in _ordered(stage.project_id) if stage_id != stage.id]
+    if position >= len(ids):
+        return move_stage(stage, None, before=True)
+    return move_stage(stage, ids[position], before=True)
+
+
+def _kept_positions(keys):
+    """Позиции самой длинной строго возрастающей подпоследовательности keys."""
+    tails, tail_positions, previous = [], [], [None] * len(keys)
+    for position, key in enumerate(keys):
+        index = bisect_left(tails, key)
+        if index == len(tails):
+            tails.append(key)
+            tail_positions.append(position)
+        else:
+            tails[index] = key
+            tail_positions[index] = position
+        previous[position] = tail_positions[index - 1] if index else None
+    kept = set()
+    position = tail_positions[-1] if tail_positions else None
+    while position is not None:
+        kept.add(position)
+        position = previous[position]
+    return kept
+
+
+def reorder_stages(project_id, order):
+    """Задаёт полный порядок этапов проекта, меняя как можно меньше строк.
+
+    Этапы, чьи ключи уже идут по возрастанию в новом порядке (самая длинная
+    такая подпоследовательность), остаются на месте; остальные получают
+    ключи в промежутках между ними. Если в каком-то промежутке не хватает
+    места, проект перенумеровывается целиком. Возвращает число обновлённых
+    строк.
+    """
+    current = dict(_ordered(project_id))
+    if len(order) != len(set(order)) or set(order) != set(current):
+        raise StageOrderError('Порядок должен перечислять каждый этап проекта ровно один раз')
+
+    keys = [current[stage_id] for stage_id in order]
+    kept = sorted(_kept_positions(keys))
+    updates = {}
+    bounds = [-1] + kept + [len(order)]
+    for start, end in zip(bounds, bounds[1:]):
+        gap = range(start + 1, end)
+        if not gap:
+            continue
+        low = keys[start] if start >= 0 else 0
+        high = keys[end] if end < len(order) else low + (len(gap) + 1) * SEQUENCE_GAP
+        step = (high - low) // (len(gap) + 1)
+        if step < 1:
+            return renormalize(project_id, order)
+        for offset, position in enumerate(gap, start=1):
+            updates[order[position]] = low + offset * step
+    return _write(updates)
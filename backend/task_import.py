@@ -0,0 +1,203 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.sql import func
+from models import db, Task, ProjectStage, RACIAssignment
+from database import bulk_returning_supported
+from permissions import stage_project_id, is_project_member
+from reference import roles
+from dashboard import adjust_task_counters
+from dependency_graph import StageDependencyGraph, insert_dependencies, invalidate_stage_graph
+from outbox import enqueue_notification, to_users
+
+MAX_IMPORT_TASKS = 5000
+
+
+class TaskImportError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def import_tasks(items, current_user_id):
+    """Создаёт пачку задач одной транзакцией и возвращает их id в порядке items.
+
+    items — уже провалидированные TaskCreateSchema словари; необязательный
+    ключ dependencies содержит индексы задач пачки (int) или названия (str)
+    задач пачки либо уже существующих задач того же этапа. Задачи без ключа
+    dependencies получают неявные зависимости по политике своего этапа.
+    """
+    if not items:
+        raise TaskImportError('Список задач пуст')
+    if len(items) > MAX_IMPORT_TASKS:
+        raise TaskImportError(f'За один запрос можно импортировать не более {MAX_IMPORT_TASKS} задач')
+
+    stage_ids = {item['stage_id'] for item in items}
+    for stage_id in stage_ids:
+        project_id = stage_project_id(stage_id)
+        if project_id is None:
+            raise TaskImportError(f'Этап {stage_id} не найден', status=404)
+        if not is_project_member(current_user_id, project_id):
+            raise TaskImportError('Доступ закрыт', status=403)
+
+    stages = {
+        stage.id: stage for stage in db.session.query(
+            ProjectStage.id, ProjectStage.project_id, ProjectStage.title, ProjectStage.dependency_policy
+        ).filter(ProjectStage.id.in_(stage_ids))
+    }
+
+    explicit_edges, existing_refs = _resolve_dependencies(items)
+    _check_batch_cycles(items, explicit_edges)
+
+    now = datetime.utcnow()
+    rows = [{
+        'stage_id': item['stage_id'],
+        'title': item['title'],
+        'description': item.get('description'),
+        'priority': item.get('priority') or 'medium',
+        'is_completed': bool(item.get('is_completed')),
+        'deadline': item.get('deadline'),
+        'created_at': now,
+        'updated_at': now
+    } for item in items]
+    if bulk_returning_supported(db.session):
+        task_ids = db.session.scalars(insert(Task).returning(Task.id, sort_by_parameter_order=True), rows).all()
+    else:
+        tasks = [Task(**row) for row in rows]
+        db.session.add_all(tasks)
+        db.session.flush()
+        task_ids = [task.id for task in tasks]
+
+    edges = [(task_ids[index], task_ids[dep_index]) for index, dep_index in explicit_edges]
+    edges += [(task_ids[index], dep_id) for index, dep_id in existing_refs]
+    edges += _implicit_edges(items, task_ids, stages)
+    insert_dependencies(sorted(set(edges)))
+
+    totals = defaultdict(lambda: [0, 0])
+    for item in items:
+        totals[item['stage_id']][0] += 1
+        totals[item['stage_id']][1] += 1 if item.get('is_completed') else 0
+    for stage_id, (total, completed) in totals.items():
+        adjust_task_counters(stage_id, total=total, completed=completed)
+        invalidate_stage_graph(stage_id)
+
+    _notify_accountable(totals, stages, current_user_id)
+
+    db.session.commit()
+    return task_ids
+
+
+def _resolve_dependencies(items):
+    """Разбирает ссылки dependencies на рёбра внутри пачки и на существующие задачи."""
+    first_by_title = {}
+    for index, item in enumerate(items):
+        first_by_title.setdefault((item['stage_id'], item['title']), index)
+
+    wanted_titles = defaultdict(set)
+    for item in items:
+        for ref in item.get('dependencies') or []:
+            if isinstance(ref, str) and (item['stage_id'], ref) not in first_by_title:
+                wanted_titles[item['stage_id']].add(ref)
+
+    existing = {}
+    if wanted_titles:
+        rows = db.session.query(Task.stage_id, Task.title, func.min(Task.id)).filter(
+            Task.stage_id.in_(list(wanted_titles)),
+            Task.title.in_({title for titles in wanted_titles.values() for title in titles})
+        ).group_by(Task.stage_id, Task.title)
+        existing = {(stage_id, title): task_id for stage_id, title, task_id in rows}
+
+    explicit_edges = []
+    existing_refs = []
+    for index, item in enumerate(items):
+        for ref in item.get('dependencies') or []:
+            if isinstance(ref, bool) or not isinstance(ref, (int, str)):
+                raise TaskImportError(f'Задача #{index}: зависимость должна быть индексом или названием')
+            if isinstance(ref, int):
+                if not 0 <= ref < len(items) or items[ref]['stage_id'] != item['stage_id']:
+                    raise TaskImportError(f'Задача #{index}: нет задачи #{ref} в том же этапе')
+                dep_index = ref
+            elif (item['stage_id'], ref) in first_by_title:
+                dep_index = first_by_title[(item['stage_id'], ref)]
+            elif (item['stage_id'], ref) in existing:
+                existing_refs.append((index, existing[(item['stage_id'], ref)]))
+                continue
+            else:
+                raise TaskImportError(f'Задача #{index}: задача с названием "{ref}" не найдена в этапе')
+            if dep_index == index:
+                raise TaskImportError(f'Задача #{index}: задача не может зависеть от самой себя')
+            explicit_edges.append((index, dep_index))
+    return explicit_edges, existing_refs
+
+
+def _check_batch_cycles(items, explicit_edges):
+    """Циклы возможны только внутри пачки: существующие задачи от новых не зависят."""
+    if not explicit_edges:
+        return
+    graph = StageDependencyGraph(None, range(len(items)), explicit_edges)
+    _, cyclic = graph.topological_order()
+    if cyclic:
+        raise TaskImportError(f'Зависимости задачи "{items[cyclic[0]]["title"]}" образуют цикл')
+
+
+def _implicit_edges(items, task_ids, stages):
+    """Неявные зависимости задач без явного dependencies по политике этапа."""
+    implicit = defaultdict(set)
+    for index, item in enumerate(items):
+        policy = stages[item['stage_id']].dependency_policy or 'all'
+        if 'dependencies' not in item and policy != 'none':
+            implicit[item['stage_id']].add(index)
+    if not implicit:
+        return []
+
+    # Новые id больше всех существующих, поэтому задачи пачки отсекаются по min.
+    open_ids = defaultdict(list)
+    for stage_id, task_id in db.session.query(Task.stage_id, Task.id).filter(
+        Task.stage_id.in_(list(implicit)),
+        Task.is_completed == False,
+        Task.id < min(task_ids)
+    ).order_by(Task.id):
+        open_ids[stage_id].append(task_id)
+
+    edges = []
+    for stage_id, indexes in implicit.items():
+        chain = stages[stage_id].dependency_policy == 'chain'
+        earlier = open_ids[stage_id][-1:] if chain else open_ids[stage_id]
+        for index, item in enumerate(items):
+            if item['stage_id'] != stage_id:
+                continue
+            if index in indexes:
+                edges.extend((task_ids[index], dep_id) for dep_id in earlier)
+            if not item.get('is_completed'):
+                if chain:
+                    earlier = [task_ids[index]]
+                else:
+                    earlier.append(task_ids[index])
+    return edges
+
+
+def _notify_accountable(totals, stages, current_user_id):
+    """Одно сводное уведомление каждому ответственному (A) затронутых этапов.
+
+    Получатели с одинаковым текстом уведомления объединяются в одно событие outbox.
+    """
+    accountable_role_id = roles.id_for('A')
+    if accountable_role_id is None:
+        return
+
+    counts = defaultdict(int)
+    first_project = {}
+    for user_id, stage_id in db.session.query(RACIAssignment.user_id, RACIAssignment.stage_id).filter(
+        RACIAssignment.stage_id.in_(list(totals)),
+        RACIAssignment.role_id == accountable_role_id,
+        RACIAssignment.user_id != current_user_id
+    ):
+        counts[user_id] += totals[stage_id][0]
+        first_project.setdefault(user_id, stages[stage_id].project_id)
+
+    audiences = defaultdict(list)
+    for user_id, count in counts.items():
+        audiences[(count, first_project[user_id])].append(user_id)
+    for (count, project_id), user_ids in audiences.items():
+        enqueue_notification(to_users(*user_ids), f"Импортировано задач: {count}", 'project', project_id)
@@ -1,34 +1,32 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Task, RACIAssignment, ProjectMember, ProjectStage, Role, Notification, TaskDependency
+from models import db, Task, RACIAssignment, ProjectStage, TaskDependency
 from datetime import datetime
-from admin import is_admin
+from permissions import is_admin, is_project_member, stage_project_id, has_stage_role
+from dashboard import adjust_task_counters
+from dependency_graph import get_stage_graph, invalidate_stage_graph, implicit_dependency_ids, insert_dependencies
+from outbox import enqueue_notification, to_users, to_stage_role
+from task_import import import_tasks, TaskImportError
+from raci import parse_assignments, apply_assignments, RaciUpdateError
+from serialization import fetch_rows
+from http_cache import conditional_json, scope_etag
 from marshmallow import Schema, fields, validate, ValidationError
+from sqlalchemy import or_
 from sqlalchemy.sql import func
 from datetime import timedelta
 
 tasks_bp = Blueprint('tasks', __name__)
 
+class RaciAssignmentSchema(Schema):
+    user_id = fields.Int(required=True)
+    role_id = fields.Int(required=True)
+
+class RaciAssignmentsSchema(Schema):
+    assignments = fields.List(fields.Nested(RaciAssignmentSchema), required=True)
+
 class TaskDependencySchema(Schema):
     dependencies = fields.List(fields.Str(), allow_none=True)  
     
-def check_cyclic_dependency(task_id, depends_on_task_id, db_session):
-    """Проверка на циклические зависимости с помощью рекурсивного поиска."""
-    visited = set()
-    def has_cycle(current_task_id, target_task_id):
-        if current_task_id in visited:
-            return False
-        visited.add(current_task_id)
-        dependencies = TaskDependency.query.filter_by(task_id=current_task_id).all()
-        for dep in dependencies:
-            if dep.depends_on_task_id == target_task_id:
-                return True
-            if has_cycle(dep.depends_on_task_id, target_task_id):
-                return True
-        return False
-    
-    return has_cycle(depends_on_task_id, task_id)
-
 class TaskCreateSchema(Schema):
     stage_id = fields.Int(required=True)
     title = fields.Str(required=True, validate=validate.Length(min=1, max=200))
@@ -53,13 +51,13 @@ def create_task():
         schema = TaskCreateSchema()
         data = schema.load(request.get_json())
         
-        stage = ProjectStage.query.get_or_404(data['stage_id'])
-        if not ProjectMember.query.filter_by(
-            user_id=current_user_id,
-            project_id=stage.project_id
-        ).first():
+        project_id = stage_project_id(data['stage_id'])
+        if project_id is None:
+            return jsonify({'error': 'Этап не найден'}), 404
+        if not is_project_member(current_user_id, project_id):
             return jsonify({'error': 'Доступ закрыт'}), 403
         
+        stage = db.session.get(ProjectStage, data['stage_id'])
         task = Task(
             stage_id=data['stage_id'],
             title=data['title'],
@@ -69,48 +67,29 @@ def create_task():
             deadline=data.get('deadline')
         )
         db.session.add(task)
-        db.session.commit()
-        
-        dependencies = Task.query.filter(
-            Task.stage_id == data['stage_id'],
-            Task.id != task.id,
-            Task.is_completed == False,
-            Task.created_at < task.created_at
-        ).all()
+        db.session.flush()
+        adjust_task_counters(task.stage_id, total=1, completed=1 if task.is_completed else 0)
         
-        for dep_task in dependencies:
-            dependency = TaskDependency(
-                task_id=task.id,
-                depends_on_task_id=dep_task.id
-            )
-            db.session.add(dependency)
+        dependency_ids = implicit_dependency_ids(task.stage_id, stage.dependency_policy or 'all', task.id)
+        insert_dependencies([(task.id, dep_id) for dep_id in dependency_ids])
+        invalidate_stage_graph(task.stage_id)
         
         if data.get('deadline'):
-            notification = Notification(
-                user_id=current_user_id,
-                message=f"Создана задача '{task.title}' с дедлайном {task.deadline.isoformat()}",
-                related_entity='task',
-                related_entity_id=task.id,
-                created_at=datetime.utcnow()
+            enqueue_notification(
+                to_users(current_user_id),
+                f"Создана задача '{task.title}' с дедлайном {task.deadline.isoformat()}",
+                'task',
+                task.id
+            )
+            enqueue_notification(
+                to_stage_role(stage.id, 'A'),
+                f"Создана задача '{task.title}' с дедлайном {task.deadline.isoformat()} в этапе {stage.title}",
+                'task',
+                task.id,
+                exclude=[current_user_id]
             )
-            db.session.add(notification)
-            
-            accountable_users = RACIAssignment.query.filter_by(
-                stage_id=stage.id,
-                role_id=Role.query.filter_by(title='A').first().id
-            ).all()
-            for assignment in accountable_users:
-                if assignment.user_id != current_user_id:
-                    notification = Notification(
-                        user_id=assignment.user_id,
-                        message=f"Создана задача '{task.title}' с дедлайном {task.deadline.isoformat()} в этапе {stage.title}",
-                        related_entity='task',
-                        related_entity_id=task.id,
-                        created_at=datetime.utcnow()
-                    )
-                    db.session.add(notification)
-            
-            db.session.commit()
+        
+        db.session.commit()
         
         return jsonify({'id': task.id}), 201
     
@@ -120,37 +99,77 @@ def create_task():
         db.session.rollback()
         return jsonify({"error": "Внутренняя ошибка", "details": str(e)}), 500
 
+@tasks_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def create_tasks_bulk():
+    """Импорт пачки задач одной транзакцией (доступно участникам проектов этапов).
+
+    Тело: {"stage_id": <этап по умолчанию>, "tasks": [{...поля TaskCreateSchema,
+    "dependencies": [индекс в пачке или название задачи этапа]}]}.
+    """
+    current_user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    raw_tasks = data.get('tasks')
+    if not isinstance(raw_tasks, list) or not all(isinstance(t, dict) for t in raw_tasks):
+        return jsonify({"error": "Поле 'tasks' должно быть списком задач"}), 400
+    
+    dependencies = []
+    payload = []
+    for raw in raw_tasks:
+        raw = dict(raw)
+        dependencies.append(raw.pop('dependencies', None))
+        if 'stage_id' not in raw and 'stage_id' in data:
+            raw['stage_id'] = data['stage_id']
+        payload.append(raw)
+    
+    try:
+        items = TaskCreateSchema(many=True).load(payload)
+        for item, deps in zip(items, dependencies):
+            if deps is not None:
+                item['dependencies'] = deps if isinstance(deps, list) else [deps]
+        
+        task_ids = import_tasks(items, current_user_id)
+        return jsonify({'ids': task_ids}), 201
+    
+    except ValidationError as e:
+        return jsonify({"error": "Некорректные данные", "details": e.messages}), 400
+    except TaskImportError as e:
+        db.session.rollback()
+        return jsonify({"error": e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Внутренняя ошибка", "details": str(e)}), 500
+
 @tasks_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_tasks():
     "Получение списка задач (доступно участникам проекта)."
     stage_id = request.args.get('stage_id')
-    project_id = request.args.get('project_id')
+    project_id = request.args.get('project_id', type=int)
     current_user_id = int(get_jwt_identity())
     
-    query = Task.query.join(ProjectStage)
-    
-    if stage_id:
-        query = query.filter(Task.stage_id == stage_id)
-    elif project_id:
-        query = query.filter(ProjectStage.project_id == project_id)
-    
-    if project_id and not ProjectMember.query.filter_by(
-        user_id=current_user_id,
-        project_id=project_id
-    ).first():
+    if project_id and not is_project_member(current_user_id, project_id):
         return jsonify({'error': 'Доступ закрыт'}), 403
 
-    
-    tasks = query.all()
-    return jsonify([{
-        'id': t.id,
-        'title': t.title,
-        'stage_id': t.stage_id,
-        'priority': t.priority,
-        'is_completed': t.is_completed,
-        'deadline': t.deadline.isoformat() if t.deadline else None
-    } for t in tasks])
+    def in_scope(query):
+        query = query.join(ProjectStage, ProjectStage.id == Task.stage_id)
+        if stage_id:
+            return query.filter(Task.stage_id == stage_id)
+        if project_id:
+            return query.filter(ProjectStage.project_id == project_id)
+        return query
+
+    # Область задаётся параметрами URL, поэтому в имени ETag её не повторяем.
+    scope = in_scope(db.session.query(func.count(Task.id), func.max(Task.updated_at))).one()
+
+    return conditional_json(scope_etag('tasks', scope), lambda: fetch_rows(in_scope(db.session.query(
+        Task.id,
+        Task.title,
+        Task.stage_id,
+        Task.priority,
+        Task.is_completed,
+        Task.deadline
+    ))))
 
 @tasks_bp.route('/<int:task_id>', methods=['PATCH'])
 @jwt_required()
@@ -159,11 +178,7 @@ def update_task(task_id):
     current_user_id = int(get_jwt_identity())
     task = Task.query.get_or_404(task_id)
     
-    stage = ProjectStage.query.get(task.stage_id)
-    if not ProjectMember.query.filter_by(
-        user_id=current_user_id,
-        project_id=stage.project_id
-    ).first():
+    if not is_project_member(current_user_id, stage_project_id(task.stage_id)):
         return jsonify({'error': 'Доступ закрыт'}), 403
     
     try:
@@ -199,7 +214,13 @@ def delete_task(task_id):
         return jsonify({"error": "Требуются права администратора"}), 403
     
     task = Task.query.get_or_404(task_id)
+    TaskDependency.query.filter(or_(
+        TaskDependency.task_id == task.id,
+        TaskDependency.depends_on_task_id == task.id
+    )).delete(synchronize_session=False)
     db.session.delete(task)
+    invalidate_stage_graph(task.stage_id)
+    adjust_task_counters(task.stage_id, total=-1, completed=-1 if task.is_completed else 0)
     db.session.commit()
     
     return jsonify({'message': 'Задача удалена'})
@@ -211,11 +232,7 @@ def get_task_raci(task_id):
     task = Task.query.get_or_404(task_id)
     current_user_id = int(get_jwt_identity())
     
-    stage = ProjectStage.query.get(task.stage_id)
-    if not ProjectMember.query.filter_by(
-        user_id=current_user_id,
-        project_id=stage.project_id
-    ).first():
+    if not is_project_member(current_user_id, stage_project_id(task.stage_id)):
         return jsonify({'error': 'Доступ закрыт'}), 403
     
     raci_assignments = RACIAssignment.query.filter_by(stage_id=task.stage_id).all()
@@ -232,33 +249,23 @@ def update_task_raci(task_id):
     current_user_id = int(get_jwt_identity())
     task = Task.query.get_or_404(task_id)
     
-    stage = ProjectStage.query.get(task.stage_id)
-    if not ProjectMember.query.filter_by(
-        user_id=current_user_id,
-        project_id=stage.project_id
-    ).first():
+    if not is_project_member(current_user_id, stage_project_id(task.stage_id)):
         return jsonify({'error': 'Доступ закрыт'}), 403
     
     if not is_admin(current_user_id):
-        if not RACIAssignment.query.filter_by(
-            stage_id=stage.id,
-            user_id=current_user_id,
-            role_id=Role.query.filter_by(title='A').first().id
-        ).first():
+        if not has_stage_role(current_user_id, task.stage_id, 'A'):
             return jsonify({'error': 'Только руководитель или админ могут изменять RACI'}), 403
     
-    data = request.get_json()
-    RACIAssignment.query.filter_by(stage_id=stage.id).delete()
-    
-    for assignment in data['assignments']:
-        raci = RACIAssignment(
-            stage_id=stage.id,
-            user_id=assignment['user_id'],
-            role_id=assignment['role_id']
-        )
-        db.session.add(raci)
-    
-    db.session.commit()
+    try:
+        data = RaciAssignmentsSchema().load(request.get_json())
+        wanted = parse_assignments(data['assignments'])
+        apply_assignments([task.stage_id], wanted, assigned_by=current_user_id)
+        db.session.commit()
+    except ValidationError as e:
+        return jsonify({"error": "Некорректные данные", "details": e.messages}), 400
+    except RaciUpdateError as e:
+        db.session.rollback()
+        return jsonify({"error": e.message}), e.status
     return jsonify({'message': 'RACI матрица обновлена'})
 
 @tasks_bp.route('/<int:task_id>/status', methods=['PATCH'])
@@ -269,19 +276,11 @@ def update_task_status(task_id):
     task = Task.query.get_or_404(task_id)
     current_user_id = int(get_jwt_identity())
     
-    stage = ProjectStage.query.get(task.stage_id)
-    if not ProjectMember.query.filter_by(
-        user_id=current_user_id,
-        project_id=stage.project_id
-    ).first():
+    if not is_project_member(current_user_id, stage_project_id(task.stage_id)):
         return jsonify({'error': 'Доступ закрыт'}), 403
     
     if not is_admin(current_user_id):
-        if not RACIAssignment.query.filter_by(
-            stage_id=stage.id,
-            user_id=current_user_id,
-            role_id=Role.query.filter_by(title='A').first().id
-        ).first():
+        if not has_stage_role(current_user_id, task.stage_id, 'A'):
             return jsonify({'error': 'Только руководитель или админ могут изменять статус задачи'}), 403
     
     if 'is_completed' in data and data['is_completed']:
@@ -291,8 +290,9 @@ def update_task_status(task_id):
             if not dep_task.is_completed:
                 return jsonify({'error': f'Задача "{task.title}" не может быть завершена, так как зависимая задача "{dep_task.title}" не завершена'}), 400
     
-    if 'is_completed' in data:
-        task.is_completed = data['is_completed']
+    if 'is_completed' in data and bool(data['is_completed']) != bool(task.is_completed):
+        task.is_completed = bool(data['is_completed'])
+        adjust_task_counters(task.stage_id, completed=1 if task.is_completed else -1)
    
     db.session.commit()
     return jsonify({'message': 'Статус задачи обновлен'})
@@ -304,11 +304,7 @@ def get_task_dependencies(task_id):
     task = Task.query.get_or_404(task_id)
     current_user_id = int(get_jwt_identity())
     
-    stage = ProjectStage.query.get(task.stage_id)
-    if not ProjectMember.query.filter_by(
-        user_id=current_user_id,
-        project_id=stage.project_id
-    ).first():
+    if not is_project_member(current_user_id, stage_project_id(task.stage_id)):
         return jsonify({'error': 'Доступ закрыт'}), 403
     
     dependencies = TaskDependency.query.filter_by(task_id=task.id).all()
@@ -324,60 +320,51 @@ def update_task_dependencies(task_id):
     current_user_id = int(get_jwt_identity())
     task = Task.query.get_or_404(task_id)
     
-    stage = ProjectStage.query.get(task.stage_id)
-    if not ProjectMember.query.filter_by(
-        user_id=current_user_id,
-        project_id=stage.project_id
-    ).first():
+    if not is_project_member(current_user_id, stage_project_id(task.stage_id)):
         return jsonify({'error': 'Доступ закрыт'}), 403
     
     if not is_admin(current_user_id):
-        if not RACIAssignment.query.filter_by(
-            stage_id=stage.id,
-            user_id=current_user_id,
-            role_id=Role.query.filter_by(title='A').first().id
-        ).first():
+        if not has_stage_role(current_user_id, task.stage_id, 'A'):
             return jsonify({'error': 'Только руководитель или админ могут изменять зависимости'}), 403
     
     try:
         schema = TaskDependencySchema()
         data = schema.load(request.get_json())
         
-        dependencies = data.get('dependencies', [])
+        dependencies = data.get('dependencies') or []
+        tasks_by_title = {}
+        for dep_task in Task.query.filter(
+            Task.stage_id == task.stage_id,
+            Task.title.in_(dependencies)
+        ).order_by(Task.id):
+            tasks_by_title.setdefault(dep_task.title, dep_task)
+        
         dependency_tasks = []
         for dep_title in dependencies:
-            dep_task = Task.query.filter_by(stage_id=task.stage_id, title=dep_title).first()
+            dep_task = tasks_by_title.get(dep_title)
             if not dep_task:
                 return jsonify({'error': f'Задача с названием "{dep_title}" не найдена в этапе'}), 400
             if dep_task.id == task.id:
                 return jsonify({'error': 'Задача не может зависеть от самой себя'}), 400
-            if check_cyclic_dependency(task.id, dep_task.id, db.session):
-                return jsonify({'error': f'Добавление зависимости "{dep_title}" создаёт циклическую зависимость'}), 400
             dependency_tasks.append(dep_task)
         
-        TaskDependency.query.filter_by(task_id=task.id).delete()
+        graph = get_stage_graph(task.stage_id, fresh=True)
+        cyclic_id = graph.find_cycle(task.id, [dep_task.id for dep_task in dependency_tasks])
+        if cyclic_id is not None:
+            dep_title = next(t.title for t in dependency_tasks if t.id == cyclic_id)
+            return jsonify({'error': f'Добавление зависимости "{dep_title}" создаёт циклическую зависимость'}), 400
         
-        for dep_task in dependency_tasks:
-            dependency = TaskDependency(
-                task_id=task.id,
-                depends_on_task_id=dep_task.id
-            )
-            db.session.add(dependency)
+        TaskDependency.query.filter_by(task_id=task.id).delete()
+        insert_dependencies([(task.id, dep_id) for dep_id in {t.id: t for t in dependency_tasks}])
+        invalidate_stage_graph(task.stage_id)
         
-        accountable_users = RACIAssignment.query.filter_by(
-            stage_id=stage.id,
-            role_id=Role.query.filter_by(title='A').first().id
-        ).all()
-        for assignment in accountable_users:
-            if assignment.user_id != current_user_id:
-                notification = Notification(
-                    user_id=assignment.user_id,
-                    message=f"Зависимости задачи '{task.title}' обновлены",
-                    related_entity='task',
-                    related_entity_id=task.id,
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(notification)
+        enqueue_notification(
+            to_stage_role(task.stage_id, 'A'),
+            f"Зависимости задачи '{task.title}' обновлены",
+            'task',
+            task.id,
+            exclude=[current_user_id]
+        )
         
         db.session.commit()
         return jsonify({'message': 'Зависимости задачи обновлены'})
@@ -386,4 +373,45 @@ def update_task_dependencies(task_id):
         return jsonify({"error": "Некорректные данные", "details": e.messages}), 400
     except Exception as e:
         db.session.rollback()
-        return jsonify({"error": "Внутренняя ошибка", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "Внутренняя ошибка", "details": str(e)}), 500
+
+@tasks_bp.route('/stage/<int:stage_id>/order', methods=['GET'])
+@jwt_required()
+def get_stage_task_order(stage_id):
+    """Топологический порядок задач этапа и списки готовых/заблокированных задач (доступно участникам проекта)."""
+    current_user_id = int(get_jwt_identity())
+    project_id = stage_project_id(stage_id)
+    if project_id is None:
+        return jsonify({'error': 'Этап не найден'}), 404
+    if not is_project_member(current_user_id, project_id):
+        return jsonify({'error': 'Доступ закрыт'}), 403
+    
+    graph = get_stage_graph(stage_id)
+    tasks = {
+        t.id: t for t in db.session.query(Task.id, Task.title, Task.is_completed)
+        .filter(Task.stage_id == stage_id)
+    }
+    order, cyclic = graph.topological_order()
+    
+    ready = []
+    blocked = []
+    for task_id in order + cyclic:
+        task = tasks.get(task_id)
+        if task is None or task.is_completed:
+            continue
+        if all(tasks[dep_id].is_completed for dep_id in graph.depends_on.get(task_id, ()) if dep_id in tasks):
+            ready.append(task_id)
+        else:
+            blocked.append(task_id)
+    
+    return jsonify({
+        'stage_id': stage_id,
+        'order': [{
+            'id': task_id,
+            'title': tasks[task_id].title,
+            'is_completed': tasks[task_id].is_completed
+        } for task_id in order if task_id in tasks],
+        'ready': ready,
+        'blocked': blocked,
+        'cyclic': [task_id for task_id in cyclic if task_id in tasks]
+    })
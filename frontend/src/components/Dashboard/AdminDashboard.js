@@ -63,7 +63,6 @@ const AdminDashboard = ({ user }) => {
         body: JSON.stringify({
           title: 'Этап 1',
           status: 'planned',
-          sequence: 0,
           deadline: null,
         }),
       });
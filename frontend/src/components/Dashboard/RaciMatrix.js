@@ -151,13 +151,13 @@ const RaciMatrix = ({ projectId, isAdmin }) => {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${localStorage.getItem('token')}`,
         },
-        body: JSON.stringify({ title: `Этап ${stages.length + 1}`, status: 'planned', sequence: stages.length, deadline: null }),
+        body: JSON.stringify({ title: `Этап ${stages.length + 1}`, status: 'planned', deadline: null }),
       });
       const data = await response.json();
       if (!response.ok) {
         throw new Error(data.error || 'Ошибка создания этапа');
       }
-      setStages([...stages, { id: data.id, title: `Этап ${stages.length + 1}`, status: 'planned', sequence: stages.length, deadline: null }]);
+      setStages([...stages, { id: data.id, title: `Этап ${stages.length + 1}`, status: 'planned', deadline: null }]);
       setCurrentStageId(data.id);
       setStageTitle(`Этап ${stages.length + 1}`);
       setIsStageTitleEditable(true);